@@ -0,0 +1,107 @@
+import argparse
+import time
+
+import numpy as np
+
+from neighbourIndex import BruteForceIndex, LSHIndex
+
+
+def synthetic_features(n_instruments, n_sectors=50, seed=0):
+    """
+    Feature vectors shaped like FinancialRecommender's: 5 min-max scaled numerics plus a sector one-hot
+    """
+    rng = np.random.default_rng(seed)
+    numerical = rng.random((n_instruments, 5))
+    sectors = np.zeros((n_instruments, n_sectors))
+    sectors[np.arange(n_instruments), rng.integers(0, n_sectors, n_instruments)] = 1
+    ids = [f'INST{i}' for i in range(n_instruments)]
+    return ids, np.hstack([numerical, sectors])
+
+
+def run_index(index, ids, vectors, queries, k):
+    """
+    Build the index incrementally and time k-neighbour queries one at a time
+    """
+    start = time.perf_counter()
+    for batch_start in range(0, len(ids), 10000):
+        index.add(ids[batch_start:batch_start + 10000], vectors[batch_start:batch_start + 10000])
+    build_time = time.perf_counter() - start
+
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append(index.search(query, k)[0])
+    query_time = (time.perf_counter() - start) / len(queries)
+
+    return build_time, query_time, [{instrument_id for instrument_id, _ in result} for result in results]
+
+
+def recommendations(index, instruments, holdings, n):
+    """
+    FinancialRecommender top-n recommendations of every user as sets of ids, through index (the
+    exact matrix path when index is None)
+    """
+    from financialRecommendation import FinancialRecommender
+
+    recommender = FinancialRecommender(similarity='on_demand', neighbour_index=index)
+    recommender.add_instrument_features(instruments)
+    for user_id, user_holdings in holdings.items():
+        recommender.add_user_holdings(user_id, user_holdings)
+    return [{instrument_id for instrument_id, _ in recommender.get_recommendations(user_id, n)} for user_id in holdings]
+
+
+def agreement(approx, exact):
+    """
+    Mean share of the exact recommendations that approx also made
+    """
+    return np.mean([len(a & e) / len(e) if e else 1.0 for a, e in zip(approx, exact)])
+
+
+def main():
+    from benchmarkSuite import synthetic_holdings, synthetic_instruments
+
+    parser = argparse.ArgumentParser(
+        description="Recall@k, latency and end-to-end recommendation agreement of LSHIndex against the exact BruteForceIndex"
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--users', type=int, default=50, help="users whose recommendations are compared")
+    parser.add_argument('--holdings', type=int, default=10, help="holdings per user")
+    parser.add_argument('--n', type=int, default=10, help="recommendations per user")
+    args = parser.parse_args()
+
+    configs = [
+        {'n_tables': 8, 'n_bits': 16, 'n_probes': 2},
+        {'n_tables': 12, 'n_bits': 18, 'n_probes': 3},
+        {'n_tables': 16, 'n_bits': 20, 'n_probes': 4},
+    ]
+
+    for n_instruments in args.sizes:
+        ids, vectors = synthetic_features(n_instruments)
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.choice(n_instruments, args.queries, replace=False)]
+
+        # Recommendations of the matrix path, which every index should reproduce
+        instruments = synthetic_instruments(n_instruments)
+        holdings = synthetic_holdings(list(instruments['instrument_id']), args.users, args.holdings)
+        exact_recommendations = recommendations(None, instruments, holdings, args.n)
+
+        print(f"\n{n_instruments} instruments, {args.queries} queries, k={args.k}, "
+              f"{args.users} users x {args.holdings} holdings, top {args.n} recommendations")
+        print(f"{'index':<46}{'build (s)':>12}{'query (ms)':>12}{'recall@k':>10}{'rec agree':>11}")
+
+        build_time, query_time, exact = run_index(BruteForceIndex(), ids, vectors, queries, args.k)
+        agree = agreement(recommendations(BruteForceIndex(), instruments, holdings, args.n), exact_recommendations)
+        print(f"{'BruteForceIndex':<46}{build_time:>12.3f}{query_time * 1000:>12.3f}{1.0:>10.3f}{agree:>11.3f}")
+
+        for config in configs:
+            build_time, query_time, approx = run_index(LSHIndex(**config), ids, vectors, queries, args.k)
+            recall = np.mean([len(a & e) / len(e) for a, e in zip(approx, exact)])
+            agree = agreement(recommendations(LSHIndex(**config), instruments, holdings, args.n), exact_recommendations)
+            name = 'LSHIndex(' + ', '.join(f'{key}={value}' for key, value in config.items()) + ')'
+            print(f"{name:<46}{build_time:>12.3f}{query_time * 1000:>12.3f}{recall:>10.3f}{agree:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,656 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Dense and top-k similarity build an N x N block, larger universes only run on_demand
+SIMILARITY_LIMIT = 20000
+
+QUESTION = "What is the traveller's name? And From where is the traveller boarding and arriving?"
+
+# QUESTION plus questions the synthetic document does not answer, so they are asked of every chunk
+QUESTIONS = [QUESTION] + [
+    "What is the booking reference?", "Which seat is reserved?", "What is the total fare?",
+    "Is a meal included?", "What is the baggage allowance?", "Which platform does the train leave from?",
+    "When does check-in close?", "What is the journey duration?", "Which coach is the seat in?"
+]
+
+
+def synthetic_instruments(n_instruments, n_sectors=11, seed=0):
+    """
+    Instrument features in the FinancialRecommender.add_instrument_features layout
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'instrument_id': [f'INST{i}' for i in range(n_instruments)],
+        'sector': [f'Sector{code}' for code in rng.integers(0, n_sectors, n_instruments)],
+        'market_cap': rng.lognormal(7, 1.5, n_instruments),
+        'pe_ratio': rng.uniform(5, 80, n_instruments),
+        'dividend_yield': rng.uniform(0, 5, n_instruments),
+        'volatility': rng.uniform(0.1, 0.6, n_instruments),
+        'beta': rng.uniform(0.5, 2, n_instruments)
+    })
+
+
+def synthetic_holdings(instrument_ids, n_users, n_holdings, seed=1):
+    """
+    add_user_holdings dicts of n_holdings random instruments for each of n_users users
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        f'USER{user}': {
+            instrument_ids[row]: {'quantity': int(rng.integers(1, 500)), 'purchase_price': float(rng.uniform(5, 500))}
+            for row in rng.choice(len(instrument_ids), n_holdings, replace=False)
+        }
+        for user in range(n_users)
+    }
+
+
+def synthetic_market_store(n_instruments, n_days, n_sectors=11, seed=2):
+    """
+    marketDataStore.MarketDataStore of random-walk prices for n_instruments over n_days business days
+    """
+    from marketDataStore import MarketDataStore
+
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2024-12-31', periods=n_days)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, (n_days, n_instruments)), axis=0))
+    volumes = rng.uniform(1e6, 5e7, (n_days, n_instruments))
+    sectors = [f'Sector{code}' for code in range(n_sectors)]
+    return MarketDataStore(
+        dates.as_unit('ns').asi8, [f'INST{i}' for i in range(n_instruments)], prices, volumes,
+        sectors, rng.integers(0, n_sectors, n_instruments)
+    )
+
+
+def synthetic_pages(n_pages, lines_per_page=40, seed=3):
+    """
+    Page texts of an itinerary-like document; only the first page holds the traveller's details
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array([
+        'booking', 'reference', 'seat', 'coach', 'departure', 'arrival', 'platform', 'fare', 'class',
+        'baggage', 'allowance', 'terminal', 'gate', 'check-in', 'schedule', 'duration', 'meal', 'station'
+    ])
+    pages = []
+    for page in range(n_pages):
+        lines = [' '.join(rng.choice(words, rng.integers(6, 14))) for _ in range(lines_per_page)]
+        if page == 0:
+            lines[3] = 'Traveller name: Jane Doe'
+            lines[4] = 'Boarding from: Mumbai Central, arriving at: New Delhi'
+        pages.append('\n'.join(lines) + '\n')
+    return pages
+
+
+def synthetic_pdf(path, pages):
+    """
+    Write a minimal PDF with one page of Helvetica text lines per entry of pages
+    """
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        ('<< /Type /Pages /Kids [' + ' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages))) +
+         f'] /Count {len(pages)} >>').encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'
+    ]
+    for i, text in enumerate(pages):
+        lines = [line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') for line in text.splitlines()]
+        stream = 'BT /F1 9 Tf 11 TL 36 806 Td ' + ' '.join(f'({line}) Tj T*' for line in lines) + ' ET'
+        objects.append((
+            '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>'
+        ).encode())
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream'.encode())
+
+    with open(path, 'wb') as f:
+        f.write(b'%PDF-1.4\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+        xref = f.tell()
+        f.write(f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode())
+        f.write(''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode())
+        f.write(f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+
+
+class StubLLM:
+    """
+    Offline stand-in for the Groq client: answers when the prompt holds the traveller's details,
+    otherwise says the answer is not in the text. Counts calls and prompt characters.
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.prompt_chars = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]['content']
+        self.prompt_chars += sum(len(message['content']) for message in messages)
+        if self.latency:
+            time.sleep(self.latency)
+
+        content = stub_answer(prompt, 'response_format' in kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def stub_answer(prompt, batched=False):
+    """
+    batched: the prompt numbers several questions after 'Questions:' and the reply is a JSON answer map
+    """
+    found = 'Traveller name:' in prompt
+    if not batched:
+        if found and 'traveller' in prompt.split('Question:')[-1]:
+            return "The traveller is Jane Doe, boarding at Mumbai Central and arriving at New Delhi."
+        return "The answer is not in the given text."
+
+    questions = re.findall(r"^\s*(\d+)\. (.*)$", prompt.split('Questions:')[-1], re.MULTILINE)
+    return json.dumps({
+        number: "Jane Doe, from Mumbai Central to New Delhi." if found and 'traveller' in question else None
+        for number, question in questions
+    })
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops bursts of concurrent connections (retried a second later)
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class StubLLMServer:
+    """
+    Local HTTP server speaking the Groq chat completions API with StubLLM's answers, for running
+    the real clients offline: groq.AsyncGroq(base_url=server.url, api_key='stub'). Each request
+    takes latency seconds; with more than max_in_flight requests open at once the extra ones get
+    429 with Retry-After: retry_after. Use as a context manager; counts requests and 429s.
+    """
+    def __init__(self, latency=0.0, max_in_flight=None, retry_after=0.05):
+        self.latency = latency
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.stats = {'requests': 0, 'rate_limited': 0}
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub._lock:
+                    stub.stats['requests'] += 1
+                    limited = stub.max_in_flight is not None and stub.in_flight >= stub.max_in_flight
+                    if limited:
+                        stub.stats['rate_limited'] += 1
+                    else:
+                        stub.in_flight += 1
+
+                if limited:
+                    self._reply(429, {'error': {'message': 'Rate limit reached', 'type': 'tokens'}},
+                                {'Retry-After': str(stub.retry_after)})
+                    return
+                try:
+                    time.sleep(stub.latency)
+                    content = stub_answer(request['messages'][-1]['content'], 'response_format' in request)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+                self._reply(200, {
+                    'id': f"stub-{stub.stats['requests']}", 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': request.get('model', 'stub'),
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}]
+                })
+
+            def _reply(self, status, body, headers=None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._server = _StubHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+def bench_recommender_fit(n_instruments, similarity):
+    from financialRecommendation import FinancialRecommender
+
+    instrument_data = synthetic_instruments(n_instruments)
+
+    def run():
+        FinancialRecommender(similarity=similarity).add_instrument_features(instrument_data)
+    return run
+
+
+def _fitted_recommender(n_instruments, similarity, n_users, n_holdings, holding_weight=None):
+    from financialRecommendation import FinancialRecommender
+
+    recommender = FinancialRecommender(similarity=similarity, holding_weight=holding_weight)
+    recommender.add_instrument_features(synthetic_instruments(n_instruments))
+    for user_id, holdings in synthetic_holdings(recommender.instrument_ids, n_users, n_holdings).items():
+        recommender.add_user_holdings(user_id, holdings)
+    return recommender
+
+
+def bench_recommender_query(n_instruments, similarity, n_users=100, n_holdings=20, holding_weight=None):
+    recommender = _fitted_recommender(n_instruments, similarity, n_users, n_holdings, holding_weight)
+
+    def run():
+        for user_id in recommender.user_holdings:
+            recommender.get_recommendations(user_id)
+    return run
+
+
+def bench_recommender_batch(n_instruments, similarity, n_users=1000, n_holdings=20, holding_weight=None):
+    recommender = _fitted_recommender(n_instruments, similarity, n_users, n_holdings, holding_weight)
+
+    def run():
+        for _ in recommender.get_recommendations_batch():
+            pass
+    return run
+
+
+def bench_sector_metrics(n_instruments, n_days, layout='frame'):
+    from sectorBasedRecommendAdded import FinancialRecommender
+
+    store = synthetic_market_store(n_instruments, n_days)
+    market_data = store if layout == 'store' else store.to_long().astype({'instrument_id': str, 'sector': str})
+    recommender = FinancialRecommender()
+
+    def run():
+        recommender._calculate_sector_metrics(market_data)
+    return run
+
+
+def bench_sector_recommender_metrics(period):
+    from marketDataSource import FakeMarketDataSource
+    from yfinanaceLibrary import SectorRecommender
+
+    recommender = SectorRecommender(FakeMarketDataSource(end='2024-12-31'))
+    sector_data = recommender.fetch_sector_data(period=period)
+
+    def run():
+        recommender.calculate_sector_metrics(sector_data)
+    return run
+
+
+def bench_sector_recommender_recommendations(period):
+    from marketDataSource import FakeMarketDataSource
+    from yfinanaceLibrary import SectorRecommender
+
+    recommender = SectorRecommender(FakeMarketDataSource(end='2024-12-31'))
+
+    def run():
+        metrics = recommender.calculate_sector_metrics(recommender.fetch_sector_data(period=period))
+        recommender.get_sector_recommendations(recommender.get_top_sectors(metrics))
+    return run
+
+
+def bench_pdf_extract(n_pages, cache='none', processes=1):
+    """
+    cache: 'none' parses every page, 'cold' parses into an empty page cache, 'warm' reads a filled one
+    """
+    from pdfText import PageTextCache, iter_pages
+
+    # Reused across runs, the cold cache is emptied before every run
+    directory = os.path.join(tempfile.gettempdir(), f'bench_pdf_{n_pages}')
+    os.makedirs(directory, exist_ok=True)
+    pdf_path = os.path.join(directory, 'document.pdf')
+    synthetic_pdf(pdf_path, synthetic_pages(n_pages))
+    cache_dir = os.path.join(directory, f'cache_{cache}')
+    if cache == 'warm':
+        for _ in iter_pages(pdf_path, cache=PageTextCache(cache_dir), processes=processes):
+            pass
+
+    def run():
+        if cache == 'cold':
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        page_cache = PageTextCache(cache_dir) if cache != 'none' else None
+        characters = sum(len(text) for text in iter_pages(pdf_path, cache=page_cache, processes=processes))
+        return {'characters': characters}
+    return run
+
+
+def bench_pdf_qa(n_pages, latency=0.0, top_k=None, cache='none'):
+    """
+    top_k: ask only the top_k retrieved chunks (index built during setup) instead of every chunk
+    cache: 'none' asks the LLM every time, 'cold' goes through an emptied LLMResponseCache,
+    'warm' through one holding every answer
+    """
+    import readFromPDFText
+    from chunkRetrieval import ChunkIndex
+    from pdfText import iter_chunks
+    from responseCache import LLMResponseCache
+
+    pages = synthetic_pages(n_pages)
+    chunk_index = ChunkIndex.build(iter_chunks(pages)) if top_k else None
+    directory = os.path.join(tempfile.gettempdir(), f'bench_llm_cache_{n_pages}')
+    shutil.rmtree(directory, ignore_errors=True)
+    response_cache = LLMResponseCache(os.path.join(directory, 'responses.sqlite')) if cache != 'none' else None
+    if cache == 'warm':
+        readFromPDFText.answer_question(StubLLM(), iter_chunks(pages), QUESTION, response_cache)
+
+    def run():
+        if cache == 'cold':
+            response_cache.clear()
+        client = StubLLM(latency)
+        chunks = chunk_index.top_chunks(QUESTION, top_k) if top_k else iter_chunks(pages)
+        answers = readFromPDFText.answer_question(client, chunks, QUESTION, response_cache)
+        return {'llm_calls': client.calls, 'prompt_chars': client.prompt_chars, 'answers': len(answers)}
+    return run
+
+
+def bench_pdf_qa_questions(n_pages, n_questions=10, batched=True):
+    """
+    Ask n_questions of QUESTIONS about the document: batched in one prompt per chunk with
+    answered questions dropped, or one answer_question loop per question
+    """
+    import readFromPDFText
+    from pdfText import iter_chunks
+
+    pages = synthetic_pages(n_pages)
+    questions = QUESTIONS[:n_questions]
+
+    def run():
+        client = StubLLM()
+        if batched:
+            answers = readFromPDFText.answer_questions(client, iter_chunks(pages), questions)
+            found = sum(answer is not None for answer in answers.values())
+        else:
+            found = sum(bool(readFromPDFText.answer_question(client, iter_chunks(pages), question)) for question in questions)
+        return {'llm_calls': client.calls, 'prompt_chars': client.prompt_chars, 'answered': found}
+    return run
+
+
+def bench_pdf_qa_concurrent(n_pages, latency=0.05, max_concurrency=8, max_answers=None, max_in_flight=None):
+    """
+    answer_question_concurrent with a real AsyncGroq client against a local StubLLMServer;
+    max_answers stops at the first answers found, max_in_flight makes the server refuse (429)
+    requests beyond that many at once
+    """
+    import groq
+    import readFromPDFText
+    from pdfText import iter_chunks
+
+    pages = synthetic_pages(n_pages)
+
+    def run():
+        with StubLLMServer(latency, max_in_flight) as server:
+            client = groq.AsyncGroq(base_url=server.url, api_key='stub', max_retries=0)
+            answers = readFromPDFText.answer_question_concurrent(
+                iter_chunks(pages), QUESTION, max_answers, client=client, max_concurrency=max_concurrency, base_delay=0.05
+            )
+        return {'llm_calls': server.stats['requests'], 'rate_limited': server.stats['rate_limited'], 'answers': len(answers)}
+    return run
+
+
+def bench_pdf_index(n_pages):
+    from chunkRetrieval import ChunkIndex
+    from pdfText import iter_chunks
+
+    pages = synthetic_pages(n_pages)
+
+    def run():
+        return {'chunks': len(ChunkIndex.build(iter_chunks(pages)))}
+    return run
+
+
+CASES = {
+    'recommender.fit': bench_recommender_fit,
+    'recommender.query': bench_recommender_query,
+    'recommender.batch': bench_recommender_batch,
+    'sector.calculate_sector_metrics': bench_sector_metrics,
+    'sector_recommender.calculate_sector_metrics': bench_sector_recommender_metrics,
+    'sector_recommender.recommendations': bench_sector_recommender_recommendations,
+    'pdf_qa.extract_pages': bench_pdf_extract,
+    'pdf_qa.build_index': bench_pdf_index,
+    'pdf_qa.answer_loop': bench_pdf_qa,
+    'pdf_qa.concurrent_answer_loop': bench_pdf_qa_concurrent,
+    'pdf_qa.questions': bench_pdf_qa_questions,
+}
+
+
+def default_suite(sizes=(1000, 10000, 100000), similarities=('dense', 'on_demand', 'top_k'),
+                  panels=((500, 2520), (5000, 2520)), periods=('1mo', '1y', '10y'), pages=(10, 100)):
+    """
+    (case name, parameters) pairs of the standard suite
+    """
+    suite = []
+    for n_instruments in sizes:
+        for similarity in similarities:
+            if similarity != 'on_demand' and n_instruments > SIMILARITY_LIMIT:
+                continue
+            params = {'n_instruments': n_instruments, 'similarity': similarity}
+            suite.append(('recommender.fit', params))
+            suite.append(('recommender.query', params))
+            suite.append(('recommender.query', dict(params, holding_weight='value')))
+            suite.append(('recommender.batch', params))
+    for n_instruments, n_days in panels:
+        for layout in ('frame', 'store'):
+            suite.append(('sector.calculate_sector_metrics', {'n_instruments': n_instruments, 'n_days': n_days, 'layout': layout}))
+    for period in periods:
+        suite.append(('sector_recommender.calculate_sector_metrics', {'period': period}))
+        suite.append(('sector_recommender.recommendations', {'period': period}))
+    for n_pages in pages:
+        for cache in ('none', 'cold', 'warm'):
+            suite.append(('pdf_qa.extract_pages', {'n_pages': n_pages, 'cache': cache}))
+        suite.append(('pdf_qa.extract_pages', {'n_pages': n_pages, 'cache': 'none', 'processes': None}))
+        suite.append(('pdf_qa.build_index', {'n_pages': n_pages}))
+        suite.append(('pdf_qa.answer_loop', {'n_pages': n_pages}))
+        suite.append(('pdf_qa.answer_loop', {'n_pages': n_pages, 'top_k': 4}))
+        for cache in ('cold', 'warm'):
+            suite.append(('pdf_qa.answer_loop', {'n_pages': n_pages, 'cache': cache}))
+        for batched in (False, True):
+            suite.append(('pdf_qa.questions', {'n_pages': n_pages, 'n_questions': 10, 'batched': batched}))
+    for n_pages in pages[:1]:
+        # One stub round trip is 50 ms: serially the loop takes that once per chunk
+        suite.append(('pdf_qa.answer_loop', {'n_pages': n_pages, 'latency': 0.05}))
+        suite.append(('pdf_qa.concurrent_answer_loop', {'n_pages': n_pages, 'max_concurrency': 64}))
+        suite.append(('pdf_qa.concurrent_answer_loop', {'n_pages': n_pages, 'max_concurrency': 8, 'max_answers': 1}))
+        suite.append(('pdf_qa.concurrent_answer_loop', {'n_pages': n_pages, 'max_concurrency': 16, 'max_in_flight': 8}))
+    return suite
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def measure(name, params, repeat=3):
+    """
+    Set up one case and time `repeat` runs of it; peak RSS covers setup and runs, allocations
+    are traced in one extra run since tracemalloc slows allocation-heavy code
+    """
+    # Progress and debug output of the benchmarked code would only interleave with the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        run = CASES[name](**params)
+        setup_rss = _peak_rss_mb()
+
+        times = []
+        counters = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            counters = run()
+            times.append(time.perf_counter() - start)
+        peak_rss = _peak_rss_mb()
+
+        tracemalloc.start()
+        try:
+            run()
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'name': name,
+        'params': params,
+        'wall_time': {'min': min(times), 'median': float(np.median(times)), 'runs': times},
+        'setup_rss_mb': setup_rss,
+        'peak_rss_mb': peak_rss,
+        'alloc_peak_mb': peak / 2**20,
+        'alloc_retained_mb': retained / 2**20,
+        'counters': counters
+    }
+
+
+def run_suite(suite, repeat=3, isolate=True):
+    """
+    Measure every case, each in a fresh process unless isolate is False so peak RSS is per case.
+    Failing cases (e.g. a missing optional dependency) are recorded with their error.
+    """
+    results = []
+    for name, params in suite:
+        try:
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                    result = executor.submit(measure, name, params, repeat).result()
+            else:
+                result = measure(name, params, repeat)
+        except Exception as e:
+            result = {'name': name, 'params': params, 'error': f"{type(e).__name__}: {e}"}
+        print_result(result)
+        results.append(result)
+    return results
+
+
+def environment():
+    """
+    Commit and platform details stored with the results, so runs can be compared across commits
+    """
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(status) if status is not None else None,
+        'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': multiprocessing.cpu_count()
+    }
+
+
+def _case_key(result):
+    return result['name'], json.dumps(result['params'], sort_keys=True)
+
+
+def _describe(result):
+    return result['name'] + '(' + ', '.join(f'{key}={value}' for key, value in result['params'].items()) + ')'
+
+
+def print_result(result):
+    if 'error' in result:
+        print(f"{_describe(result):<90}{'error: ' + result['error']}")
+        return
+    peak_rss = result['peak_rss_mb']
+    print(
+        f"{_describe(result):<90}{result['wall_time']['median'] * 1000:>12.2f}"
+        f"{peak_rss if peak_rss is not None else float('nan'):>12.1f}{result['alloc_peak_mb']:>12.1f}"
+    )
+
+
+def compare(baseline, current):
+    """
+    Print the median wall time and allocation peak of current relative to baseline for every shared case
+    """
+    previous = {_case_key(result): result for result in baseline['results'] if 'error' not in result}
+    print(f"\nChange against {baseline['environment'].get('commit')}")
+    print(f"{'case':<90}{'time':>10}{'alloc':>10}")
+    for result in current['results']:
+        before = previous.get(_case_key(result))
+        if before is None or 'error' in result:
+            continue
+        time_ratio = result['wall_time']['median'] / before['wall_time']['median']
+        alloc_ratio = result['alloc_peak_mb'] / before['alloc_peak_mb'] if before['alloc_peak_mb'] else float('nan')
+        print(f"{_describe(result):<90}{time_ratio:>9.2f}x{alloc_ratio:>9.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wall time, peak RSS and allocations of the project's hot paths on synthetic data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help="recommender universe sizes")
+    parser.add_argument('--similarity', nargs='+', default=['dense', 'on_demand', 'top_k'])
+    parser.add_argument('--panel-instruments', type=int, nargs='+', default=[500, 5000])
+    parser.add_argument('--panel-days', type=int, default=2520)
+    parser.add_argument('--periods', nargs='+', default=['1mo', '1y', '10y'])
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--filter', nargs='+', help="only run cases whose name contains one of these")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--inline', action='store_true', help="run every case in this process")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    suite = default_suite(
+        args.sizes, args.similarity, [(n, args.panel_days) for n in args.panel_instruments], args.periods, args.pages
+    )
+    if args.filter:
+        suite = [(name, params) for name, params in suite if any(part in name for part in args.filter)]
+
+    print(f"{'case':<90}{'median (ms)':>12}{'RSS (MB)':>12}{'alloc (MB)':>12}")
+    current = {'environment': environment(), 'results': run_suite(suite, args.repeat, not args.inline)}
+
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), current)
+
+
+if __name__ == "__main__":
+    main()
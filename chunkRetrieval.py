@@ -0,0 +1,205 @@
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+import neighbourIndex
+import snapshotFiles
+from pdfText import PageTextCache, file_hash, iter_chunks, iter_pages
+
+# Version of the on-disk layout written by ChunkIndex.save
+INDEX_VERSION = 1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Deterministic offline embeddings: word unigrams and bigrams hashed (crc32) into n_features
+    signed buckets, log-scaled counts weighted by the inverse document frequency of each bucket
+    over the chunks passed to fit()
+    """
+    def __init__(self, n_features=2**12):
+        self.n_features = n_features
+        self.idf = np.ones(n_features, dtype=np.float32)
+
+    @property
+    def name(self):
+        return f'hashing-{self.n_features}'
+
+    def snapshot(self):
+        return {'n_features': self.n_features}, {'idf': self.idf}
+
+    @classmethod
+    def from_snapshot(cls, params, arrays):
+        embedder = cls(params['n_features'])
+        embedder.idf = arrays['idf']
+        return embedder
+
+    def fit(self, texts):
+        """
+        Weight each bucket by its smoothed inverse document frequency over texts
+        """
+        counts = self._counts(texts)
+        document_frequency = (counts != 0).sum(axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def embed(self, texts):
+        counts = self._counts(texts)
+        return np.sign(counts) * np.log1p(np.abs(counts)) * self.idf
+
+    def _counts(self, texts):
+        counts = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            features = tokens + [f'{first} {second}' for first, second in zip(tokens, tokens[1:])]
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode()) for feature in features), dtype=np.uint32, count=len(features)
+            )
+            # The top hash bit picks the sign so colliding features tend to cancel rather than add up
+            signs = np.where(hashes >> 31, -1.0, 1.0)
+            np.add.at(counts[row], hashes % self.n_features, signs)
+        return counts
+
+
+class SentenceTransformerEmbedder:
+    """
+    Embeddings from a local sentence-transformers model (requires sentence-transformers)
+    """
+    def __init__(self, model_name='all-MiniLM-L6-v2'):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    @property
+    def name(self):
+        return f'st-{self.model_name.replace("/", "-")}'
+
+    def snapshot(self):
+        return {'model_name': self.model_name}, {}
+
+    @classmethod
+    def from_snapshot(cls, params, arrays):
+        return cls(params['model_name'])
+
+    def embed(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True)
+
+
+EMBEDDERS = {'HashingEmbedder': HashingEmbedder, 'SentenceTransformerEmbedder': SentenceTransformerEmbedder}
+
+
+class ChunkIndex:
+    """
+    Retrieval over text chunks: every chunk is embedded once and stored in a neighbourIndex
+    index (exact BruteForceIndex by default), so a question is only asked of its k most
+    similar chunks. Saved as .npy arrays plus a manifest, like FinancialRecommender snapshots.
+    """
+    def __init__(self, embedder=None, index=None):
+        self.embedder = embedder if embedder is not None else HashingEmbedder()
+        self.index = index if index is not None else neighbourIndex.BruteForceIndex()
+        self.chunks = []
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @classmethod
+    def build(cls, chunks, embedder=None, index=None, batch_size=256):
+        """
+        Embed chunks (any iterable of strings, e.g. pdfText.iter_chunks) into a new index
+        """
+        chunk_index = cls(embedder, index)
+        chunk_index.chunks = list(chunks)
+        if hasattr(chunk_index.embedder, 'fit'):
+            chunk_index.embedder.fit(chunk_index.chunks)
+
+        chunk_index.index.reset()
+        for start in range(0, len(chunk_index.chunks), batch_size):
+            batch = chunk_index.chunks[start:start + batch_size]
+            chunk_index.index.add(range(start, start + len(batch)), chunk_index.embedder.embed(batch))
+        return chunk_index
+
+    def search(self, question, k=4):
+        """
+        The k chunks most similar to question as (chunk, similarity) pairs, best first
+        """
+        if not self.chunks:
+            return []
+        neighbours = self.index.search(self.embedder.embed([question]), k)[0]
+        return [(self.chunks[position], similarity) for position, similarity in neighbours]
+
+    def top_chunks(self, question, k=4):
+        """
+        The k chunks most similar to question, in document order
+        """
+        if not self.chunks:
+            return []
+        neighbours = self.index.search(self.embedder.embed([question]), k)[0]
+        return [self.chunks[position] for position in sorted(position for position, _ in neighbours)]
+
+    def save(self, path):
+        """
+        Write the index to directory path, safely over an index other processes are using
+        """
+        generation = snapshotFiles.new_generation(path)
+        directory = os.path.join(path, generation)
+        embedder_params, embedder_arrays = self.embedder.snapshot()
+        index_params, index_arrays = self.index.snapshot()
+        for prefix, arrays in (('embedder', embedder_arrays), ('index', index_arrays)):
+            for name, array in arrays.items():
+                np.save(os.path.join(directory, f'{prefix}_{name}.npy'), array)
+        with open(os.path.join(directory, 'chunks.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.chunks, f)
+
+        manifest = {
+            'version': INDEX_VERSION,
+            'embedder': {'type': type(self.embedder).__name__, 'params': embedder_params, 'arrays': list(embedder_arrays)},
+            'index': {'type': type(self.index).__name__, 'params': index_params, 'arrays': list(index_arrays)}
+        }
+        # The manifest is swapped in last, so a half-written index is never loadable
+        snapshotFiles.publish(path, generation, manifest)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index written by save
+        """
+        return snapshotFiles.load(path, cls._from_snapshot)
+
+    @classmethod
+    def _from_snapshot(cls, manifest, path):
+        if manifest['version'] != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {manifest['version']}, expected {INDEX_VERSION}")
+
+        def load_arrays(prefix, names):
+            return {name: np.load(os.path.join(path, f'{prefix}_{name}.npy')) for name in names}
+
+        embedder = EMBEDDERS[manifest['embedder']['type']].from_snapshot(
+            manifest['embedder']['params'], load_arrays('embedder', manifest['embedder']['arrays'])
+        )
+        index = getattr(neighbourIndex, manifest['index']['type']).from_snapshot(
+            manifest['index']['params'], load_arrays('index', manifest['index']['arrays'])
+        )
+        chunk_index = cls(embedder, index)
+        with open(os.path.join(path, 'chunks.json'), encoding='utf-8') as f:
+            chunk_index.chunks = json.load(f)
+        return chunk_index
+
+
+def load_pdf_index(pdf_path, cache_dir='.pdf_cache', embedder=None):
+    """
+    ChunkIndex of a PDF's chunks, built on first use and kept next to the cached page text under
+    cache_dir/<file hash>/index-<embedder name>
+    """
+    embedder = embedder if embedder is not None else HashingEmbedder()
+    path = os.path.join(cache_dir, file_hash(pdf_path), f'index-{embedder.name}')
+    if os.path.exists(os.path.join(path, 'manifest.json')):
+        return ChunkIndex.load(path)
+
+    chunk_index = ChunkIndex.build(iter_chunks(iter_pages(pdf_path, cache=PageTextCache(cache_dir))), embedder)
+    chunk_index.save(path)
+    return chunk_index
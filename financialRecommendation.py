@@ -1,13 +1,188 @@
+import os
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from collections import defaultdict
+from collections.abc import Mapping
+from itertools import islice
+from scipy.sparse import csr_matrix
+
+import neighbourIndex
+import snapshotFiles
+from resultCache import MISSING
+
+# Version of the on-disk layout written by FinancialRecommender.save
+SNAPSHOT_VERSION = 2
+
+# Per-instrument arrays written to a snapshot, each as <name>.npy
+SNAPSHOT_ARRAYS = [
+    'raw_numerical', 'sector_codes', 'feature_min', 'feature_max', 'numeric_features',
+    'similarity_matrix', 'normalized_features', 'sector_weights', 'neighbour_rows', 'neighbour_scores'
+]
+
+# Bytes get_recommendations_batch needs per user and instrument: the float64 score block and
+# its partitioned copy, plus headroom for the selection masks and tie counts
+BATCH_BYTES_PER_SCORE = 24
+
+
+class InstrumentFeatures(Mapping):
+    """
+    Read-only instrument_id -> feature vector view of a FinancialRecommender's compact feature store.
+    Vectors (normalized numerics followed by the sector one-hot columns) are built on lookup.
+    """
+    def __init__(self, recommender):
+        self.recommender = recommender
+
+    def __getitem__(self, instrument_id):
+        return self.recommender._feature_rows([self.recommender.instrument_index[instrument_id]])[0]
+
+    def __iter__(self):
+        return iter(self.recommender.instrument_ids)
+
+    def __len__(self):
+        return len(self.recommender.instrument_ids)
+
 
 class FinancialRecommender:
-    def __init__(self):
+    def __init__(self, similarity='dense', dtype=np.float64, top_k=50, neighbour_index=None, n_neighbours=50,
+                 result_cache=None, holding_weight=None):
+        """
+        similarity: how instrument similarities are stored
+        - 'dense': full N x N cosine similarity matrix
+        - 'on_demand': only L2-normalized feature vectors, similarities computed per query
+        - 'top_k': L2-normalized feature vectors plus the top_k strongest neighbours of each instrument
+        dtype: float dtype of the stored vectors/similarities, e.g. np.float32 to halve memory
+        neighbour_index: optional neighbourIndex.NeighbourIndex (e.g. BruteForceIndex or LSHIndex);
+        when set, recommendations only score the n_neighbours nearest instruments of each holding
+        result_cache: optional resultCache.ResultCache; get_recommendations and explain_recommendation
+        results are cached per holdings set and model version
+        holding_weight: how much each holding's similarities count towards a user's scores
+        - None: every holding counts equally
+        - 'value': position value, quantity * purchase_price
+        - a function (instrument_id, holding details) -> weight
+        Weights are scaled to a mean of 1, so equal weights give the same scores as None.
+        """
+        if similarity not in ('dense', 'on_demand', 'top_k'):
+            raise ValueError("similarity must be one of: 'dense', 'on_demand', 'top_k'")
+        if holding_weight not in (None, 'value') and not callable(holding_weight):
+            raise ValueError("holding_weight must be None, 'value' or a function")
+
+        self.similarity = similarity
+        self.dtype = np.dtype(dtype)
+        self.top_k = top_k
         self.user_holdings = {}
-        self.instrument_features = {}
+        self.instrument_features = InstrumentFeatures(self)
+        self.numerical_columns = []
+        self.sector_columns = []
+        self.feature_columns = []
+        self.raw_numerical = None
+        self.sector_codes = None
+        self.feature_min = None
+        self.feature_max = None
+        self.numeric_features = None
+        self.instrument_ids = []
+        self.instrument_index = {}
         self.similarity_matrix = None
+        self.normalized_features = None
+        self.sector_weights = None
+        self.neighbour_rows = None
+        self.neighbour_scores = None
+        self.neighbour_index = neighbour_index
+        self.n_neighbours = n_neighbours
+        self.holding_weight = holding_weight
+        
+        # Bumped on every change to the instrument universe, part of every result cache key
+        self.model_version = 0
+        self.result_cache = result_cache
+        self._holdings_keys = {}
+        
+    def save(self, path):
+        """
+        Write the instrument model to directory path: one .npy file per array plus a manifest.json.
+        User holdings are not part of the snapshot. Saving over an existing snapshot is safe while
+        other processes have it loaded or are loading it (see snapshotFiles).
+        """
+        generation = snapshotFiles.new_generation(path)
+        directory = os.path.join(path, generation)
+        
+        arrays = [name for name in SNAPSHOT_ARRAYS if getattr(self, name) is not None]
+        for name in arrays:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+            
+        index = None
+        if self.neighbour_index is not None:
+            params, index_arrays = self.neighbour_index.snapshot()
+            for name, array in index_arrays.items():
+                np.save(os.path.join(directory, f'index_{name}.npy'), array)
+            index = {'type': type(self.neighbour_index).__name__, 'params': params, 'arrays': list(index_arrays)}
+        
+        manifest = {
+            'version': SNAPSHOT_VERSION,
+            'similarity': self.similarity,
+            'dtype': self.dtype.str,
+            'top_k': self.top_k,
+            'n_neighbours': self.n_neighbours,
+            # Weight functions cannot be stored, pass them to load again
+            'holding_weight': self.holding_weight if isinstance(self.holding_weight, str) else None,
+            'instrument_ids': self.instrument_ids,
+            'numerical_columns': self.numerical_columns,
+            'sector_columns': self.sector_columns,
+            'arrays': arrays,
+            'neighbour_index': index
+        }
+        
+        # The manifest is swapped in last, so a half-written snapshot is never loadable
+        snapshotFiles.publish(path, generation, manifest)
+    
+    @classmethod
+    def load(cls, path, mmap=True, **options):
+        """
+        Load a snapshot written by save.
+        With mmap=True the arrays are memory-mapped read-only, so every worker process of a
+        pre-fork server shares one copy through the page cache; such a model serves queries but
+        must be loaded with mmap=False to be updated.
+        options: constructor arguments overriding the saved ones, e.g. a result_cache for each
+        worker, or holding_weight; a weight function is not saved, so a model weighted by one is
+        loaded unweighted unless it is passed again
+        """
+        return snapshotFiles.load(
+            path, lambda manifest, directory: cls._from_snapshot(manifest, directory, mmap, options)
+        )
+    
+    @classmethod
+    def _from_snapshot(cls, manifest, directory, mmap, options):
+        if manifest['version'] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {manifest['version']}, expected {SNAPSHOT_VERSION}")
+            
+        mmap_mode = 'r' if mmap else None
+        
+        def load_array(name):
+            return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+        
+        index = None
+        if manifest['neighbour_index'] is not None:
+            index_class = getattr(neighbourIndex, manifest['neighbour_index']['type'])
+            index = index_class.from_snapshot(
+                manifest['neighbour_index']['params'],
+                {name: load_array(f'index_{name}') for name in manifest['neighbour_index']['arrays']}
+            )
+        
+        saved = {
+            'similarity': manifest['similarity'],
+            'dtype': np.dtype(manifest['dtype']),
+            'top_k': manifest['top_k'],
+            'neighbour_index': index,
+            'n_neighbours': manifest['n_neighbours'],
+            'holding_weight': manifest.get('holding_weight')
+        }
+        recommender = cls(**dict(saved, **options))
+        recommender.numerical_columns = manifest['numerical_columns']
+        recommender.sector_columns = manifest['sector_columns']
+        recommender.feature_columns = recommender.numerical_columns + recommender.sector_columns
+        for name in manifest['arrays']:
+            setattr(recommender, name, load_array(name))
+        recommender.instrument_ids = manifest['instrument_ids']
+        recommender._reindex_instruments()
+        
+        return recommender
         
     def add_user_holdings(self, user_id, holdings):
         """
@@ -15,6 +190,7 @@ class FinancialRecommender:
         holdings: dict with instrument_id as key and holding details as value
         """
         self.user_holdings[user_id] = holdings
+        self._holdings_keys.pop(user_id, None)
         
     def add_instrument_features(self, instrument_data):
         """
@@ -28,25 +204,542 @@ class FinancialRecommender:
         - volatility
         - beta
         """
-        # Convert categorical variables to dummy variables
-        sector_dummies = pd.get_dummies(instrument_data['sector'])
+        instrument_ids = list(instrument_data['instrument_id'])
+        if len(set(instrument_ids)) != len(instrument_ids):
+            raise ValueError("Duplicate instrument_id values")
+            
+        # Integer-code sectors, each code stands for an implicit one-hot sector column
+        sector_codes, sectors = pd.factorize(instrument_data['sector'], sort=True)
+        self.sector_columns = list(sectors)
+        self.sector_codes = sector_codes.astype(np.int32)
+        
+        # Keep raw numerical values and their min-max bounds so instruments can be updated incrementally
+        numerical_features = self._numerical_features(instrument_data)
+        self.numerical_columns = list(numerical_features.columns)
+        self.raw_numerical = numerical_features.to_numpy(dtype=np.float64, copy=True)
+        self.feature_min = numerical_features.min().to_numpy(dtype=np.float64)
+        self.feature_max = numerical_features.max().to_numpy(dtype=np.float64)
+        
+        # Normalized numerical features in one float32 block; the sector one-hot columns are
+        # never stored, similarities add their contribution from the sector codes
+        self.feature_columns = self.numerical_columns + self.sector_columns
+        self.numeric_features = self._scale(self.raw_numerical)
         
-        # Normalize numerical features
+        # Keep a persistent instrument_id -> row index for vectorized scoring
+        self.instrument_ids = instrument_ids
+        self._reindex_instruments()
+        
+        # Calculate similarities
+        self._build_similarity()
+        if self.neighbour_index is not None:
+            self.neighbour_index.build(self.instrument_ids, self._feature_rows())
+        self._model_changed()
+
+    def _numerical_features(self, instrument_data):
+        """
+        Raw numerical instrument features, min-max normalized by _scale
+        """
         numerical_features = ['market_cap', 'pe_ratio', 'dividend_yield', 'volatility', 'beta']
-        normalized_features = instrument_data[numerical_features].apply(lambda x: (x - x.min()) / (x.max() - x.min()))
+        return instrument_data[numerical_features].astype(np.float64)
+
+    def _scale(self, raw_numerical):
+        """
+        Min-max normalized numerical features as a float32 block
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return ((raw_numerical - self.feature_min) / (self.feature_max - self.feature_min)).astype(np.float32)
+
+    def _feature_rows(self, rows=slice(None)):
+        """
+        Explicit feature vectors of rows: normalized numerics followed by the sector one-hot columns.
+        Only built for the neighbour index and instrument_features lookups.
+        """
+        numeric = self.numeric_features[rows]
+        sector_codes = self.sector_codes[rows]
+        n_numerical = numeric.shape[1]
+        vectors = np.zeros((len(numeric), n_numerical + len(self.sector_columns)), dtype=self.dtype)
+        vectors[:, :n_numerical] = numeric
+        has_sector = sector_codes >= 0
+        vectors[np.flatnonzero(has_sector), n_numerical + sector_codes[has_sector]] = 1
+        return vectors
+
+    def _model_changed(self):
+        """
+        Invalidate cached results after the instrument universe changed
+        """
+        self.model_version += 1
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
+    def _holdings_key(self, user_id):
+        """
+        Hashable key of a user's holdings (and their weights), recomputed only when they are replaced
+        """
+        holdings = self.user_holdings[user_id]
+        cached = self._holdings_keys.get(user_id)
+        if cached is None or cached[0] is not holdings:
+            weights = self._holding_weights(holdings)
+            if weights is None:
+                cached = (holdings, frozenset(holdings))
+            else:
+                cached = (holdings, frozenset(zip(holdings, weights.tolist())))
+            self._holdings_keys[user_id] = cached
+        return cached[1]
+
+    def _holding_weights(self, holdings):
+        """
+        Weight of each holding in holdings order, scaled to a mean of 1; None when unweighted
+        """
+        if self.holding_weight is None:
+            return None
         
-        # Combine features
-        features = pd.concat([normalized_features, sector_dummies], axis=1)
+        if self.holding_weight == 'value':
+            try:
+                weights = [holding['quantity'] * holding['purchase_price'] for holding in holdings.values()]
+            except KeyError as e:
+                raise ValueError(f"Holding has no {e.args[0]} for value weighting")
+        else:
+            weights = [self.holding_weight(instrument_id, holding) for instrument_id, holding in holdings.items()]
         
-        # Create dictionary with instrument_id as key and features as value
-        self.instrument_features = {
-            instrument_id: features.loc[idx].values 
-            for idx, instrument_id in enumerate(instrument_data['instrument_id'])
+        weights = np.asarray(weights, dtype=np.float64)
+        mean = weights.mean() if len(weights) else 0
+        return weights / mean if mean else weights
+    
+    def _held_rows(self, holdings):
+        """
+        Similarity matrix rows of a holdings dict and their weights (None when unweighted)
+        """
+        weights = self._holding_weights(holdings)
+        if weights is None:
+            return self._rows_for(set(holdings.keys())), None
+        return self._rows_for(holdings.keys()), weights
+
+    def _update_bounds(self):
+        """
+        Recompute the min-max normalization bounds from the raw values, returns True if any moved
+        """
+        feature_min = np.fmin.reduce(self.raw_numerical, axis=0)
+        feature_max = np.fmax.reduce(self.raw_numerical, axis=0)
+        bounds_moved = not (
+            np.array_equal(feature_min, self.feature_min, equal_nan=True) and
+            np.array_equal(feature_max, self.feature_max, equal_nan=True)
+        )
+        self.feature_min, self.feature_max = feature_min, feature_max
+        return bounds_moved
+
+    def _reindex_instruments(self):
+        """
+        Rebuild the instrument_id -> row index
+        """
+        self.instrument_index = {
+            instrument_id: idx for idx, instrument_id in enumerate(self.instrument_ids)
         }
+
+    def upsert_instruments(self, instrument_data):
+        """
+        Add new instruments or update existing ones without recomputing the whole feature space.
+        Normalization bounds, sector columns and similarity structures are updated in place;
+        existing vectors are only rescaled when the upsert moves a min or max bound.
+        instrument_data: DataFrame with the same columns as add_instrument_features
+        """
+        if not self.instrument_ids:
+            self.add_instrument_features(instrument_data)
+            return
+        
+        instrument_ids = list(instrument_data['instrument_id'])
+        if len(set(instrument_ids)) != len(instrument_ids):
+            raise ValueError("Duplicate instrument_id values")
+            
+        numerical_features = self._numerical_features(instrument_data)
+        if list(numerical_features.columns) != self.numerical_columns:
+            raise ValueError("Numerical feature columns changed, use add_instrument_features instead")
+        raw_numerical = numerical_features.to_numpy(dtype=np.float64)
+        
+        # Only a valid upsert invalidates cached results
+        self._model_changed()
+        
+        # Unseen sectors get new codes, no existing instrument is in them
+        sector_positions = {sector: code for code, sector in enumerate(self.sector_columns)}
+        for sector in instrument_data['sector'].dropna().unique():
+            if sector not in sector_positions:
+                sector_positions[sector] = len(self.sector_columns)
+                self.sector_columns.append(sector)
+        sector_codes = np.array(
+            [sector_positions.get(sector, -1) for sector in instrument_data['sector']], dtype=np.int32
+        )
+        self.feature_columns = self.numerical_columns + self.sector_columns
+        
+        # Updated instruments keep their row, new instruments are appended
+        rows = np.array([self.instrument_index.get(i, -1) for i in instrument_ids], dtype=np.intp)
+        is_new = rows < 0
+        n_previous = len(self.instrument_ids)
+        rows[is_new] = np.arange(n_previous, n_previous + is_new.sum())
+        self.instrument_ids.extend(i for i, new in zip(instrument_ids, is_new) if new)
+        
+        if is_new.any():
+            self.raw_numerical = np.concatenate([self.raw_numerical, raw_numerical[is_new]])
+            self.sector_codes = np.concatenate([self.sector_codes, sector_codes[is_new]])
+        self.raw_numerical[rows] = raw_numerical
+        self.sector_codes[rows] = sector_codes
+        
+        if is_new.any():
+            self._reindex_instruments()
+        
+        if self._update_bounds():
+            # A bound moved so every instrument's normalized numerics change, rebuild from the raw values
+            self.numeric_features = self._scale(self.raw_numerical)
+            self._build_similarity()
+            if self.neighbour_index is not None:
+                self.neighbour_index.build(self.instrument_ids, self._feature_rows())
+            return
+        
+        # Otherwise only the upserted rows change
+        if is_new.any():
+            self.numeric_features = np.pad(self.numeric_features, ((0, is_new.sum()), (0, 0)))
+        self.numeric_features[rows] = self._scale(raw_numerical)
+        
+        self._update_similarity(rows)
+        if self.neighbour_index is not None:
+            self.neighbour_index.add(instrument_ids, self._feature_rows(rows))
+
+    def remove_instruments(self, instrument_ids):
+        """
+        Remove instruments without recomputing the whole feature space.
+        Similarities between the remaining instruments are kept; existing vectors are only
+        rescaled when a removed instrument held a min or max bound.
+        """
+        remove_rows = self._rows_for(set(instrument_ids))
+        if len(remove_rows) == 0:
+            return
+        
+        self._model_changed()
+        keep = np.ones(len(self.instrument_ids), dtype=bool)
+        keep[remove_rows] = False
+        removed_ids = [self.instrument_ids[row] for row in remove_rows]
+        if self.neighbour_index is not None:
+            self.neighbour_index.remove(removed_ids)
+        
+        if not keep.any():
+            # Nothing left to compare, the next upsert starts a fresh feature space
+            self.instrument_ids = []
+            self.instrument_index = {}
+            self.numeric_features = None
+            self._build_similarity()
+            return
+        
+        # Compact the per-instrument arrays
+        self.instrument_ids = [i for i, kept in zip(self.instrument_ids, keep) if kept]
+        self.raw_numerical = self.raw_numerical[keep]
+        self.sector_codes = self.sector_codes[keep]
+        self.numeric_features = self.numeric_features[keep]
+        self._reindex_instruments()
+        
+        if self._update_bounds():
+            self.numeric_features = self._scale(self.raw_numerical)
+            self._build_similarity()
+            if self.neighbour_index is not None:
+                self.neighbour_index.build(self.instrument_ids, self._feature_rows())
+            return
+        
+        if self.similarity == 'dense':
+            self.similarity_matrix = self.similarity_matrix[np.ix_(keep, keep)]
+            return
+        
+        self.normalized_features = self.normalized_features[keep]
+        self.sector_weights = self.sector_weights[keep]
+        if self.similarity == 'top_k':
+            # Map neighbour rows to the compacted positions, removed neighbours become -1
+            new_positions = np.cumsum(keep) - 1
+            new_positions[~keep] = -1
+            self.neighbour_rows = new_positions[self.neighbour_rows[keep]]
+            self.neighbour_scores = self.neighbour_scores[keep]
+            
+            if self.neighbour_rows.shape[1] > len(self.instrument_ids) - 1:
+                self._build_neighbour_graph()
+            else:
+                # Only instruments that lost a neighbour need their list recomputed
+                self._refresh_neighbours(np.flatnonzero((self.neighbour_rows < 0).any(axis=1)))
+
+    def _build_similarity(self):
+        """
+        Build the similarity structures for the configured similarity mode
+        """
+        self.similarity_matrix = None
+        self.normalized_features = None
+        self.sector_weights = None
+        self.neighbour_rows = None
+        self.neighbour_scores = None
+        if self.numeric_features is None:
+            return
+
+        if self.similarity == 'dense':
+            vectors, sector_weights = self._unit_vectors()
+            self.similarity_matrix = vectors @ vectors.T
+            # The implicit sector columns only add to pairs of instruments in the same sector
+            for code in np.unique(self.sector_codes[self.sector_codes >= 0]):
+                members = np.flatnonzero(self.sector_codes == code)
+                self.similarity_matrix[np.ix_(members, members)] += np.outer(
+                    sector_weights[members], sector_weights[members]
+                )
+            return
+
+        # L2-normalize once so cosine similarity becomes a dot product plus a same-sector term
+        self.normalized_features, self.sector_weights = self._unit_vectors()
+
+        if self.similarity == 'top_k':
+            self._build_neighbour_graph()
+
+    def _unit_vectors(self, rows=slice(None)):
+        """
+        L2-normalized feature vectors of rows in compact form: the scaled numeric block and the
+        value of the instrument's one-hot sector column (0 without a sector)
+        """
+        numeric = self.numeric_features[rows].astype(np.float64)
+        has_sector = self.sector_codes[rows] >= 0
+        norms = np.sqrt(np.einsum('ij,ij->i', numeric, numeric) + has_sector)
+        norms[norms == 0] = 1
+        return (numeric / norms[:, None]).astype(self.dtype, copy=False), (has_sector / norms).astype(self.dtype)
+
+    def _cosine_block(self, rows, cols=None):
+        """
+        Cosine similarities between instruments at rows and cols (all instruments if cols is None),
+        from the compact vectors without building the one-hot sector columns
+        """
+        if self.normalized_features is None:
+            vectors, sector_weights = self._unit_vectors()
+        else:
+            vectors, sector_weights = self.normalized_features, self.sector_weights
+        cols = slice(None) if cols is None else cols
+
+        block = vectors[rows] @ vectors[cols].T
+        same_sector = self.sector_codes[rows][:, None] == self.sector_codes[cols][None, :]
+        block += same_sector * np.outer(sector_weights[rows], sector_weights[cols])
+        return block
+
+    def _update_similarity(self, rows):
+        """
+        Refresh the similarity structures after the feature rows at rows changed or were appended
+        """
+        n_instruments = len(self.instrument_ids)
+
+        if self.similarity == 'dense':
+            # Only the changed rows and columns of the matrix are recomputed
+            block = self._cosine_block(rows)
+            n_previous, n_columns = self.similarity_matrix.shape
+            if n_instruments > n_previous:
+                self.similarity_matrix = np.pad(
+                    self.similarity_matrix, ((0, n_instruments - n_previous), (0, n_instruments - n_columns))
+                )
+            self.similarity_matrix[rows] = block
+            self.similarity_matrix[:, rows] = block.T
+            return
+
+        n_previous = len(self.normalized_features)
+        if n_instruments > n_previous:
+            self.normalized_features = np.pad(self.normalized_features, ((0, n_instruments - n_previous), (0, 0)))
+            self.sector_weights = np.pad(self.sector_weights, (0, n_instruments - n_previous))
+        self.normalized_features[rows], self.sector_weights[rows] = self._unit_vectors(rows)
+
+        if self.similarity == 'top_k':
+            k = self.neighbour_rows.shape[1]
+            if k < min(self.top_k, n_instruments - 1):
+                # The universe was too small for top_k neighbours before
+                self._build_neighbour_graph()
+                return
+
+            block = self._cosine_block(rows)
+            block[np.arange(len(rows)), rows] = -np.inf
+
+            # Drop stale similarities to changed rows, then merge their fresh ones into every list
+            neighbour_rows = np.pad(self.neighbour_rows, ((0, n_instruments - n_previous), (0, 0)))
+            neighbour_scores = np.pad(self.neighbour_scores, ((0, n_instruments - n_previous), (0, 0)))
+            previous_kth = neighbour_scores.min(axis=1)
+            neighbour_scores[np.isin(neighbour_rows, rows)] = -np.inf
+            candidate_rows = np.hstack([neighbour_rows, np.broadcast_to(rows, (n_instruments, len(rows)))])
+            candidate_scores = np.hstack([neighbour_scores, block.T])
+
+            top = np.argpartition(-candidate_scores, k - 1, axis=1)[:, :k]
+            self.neighbour_rows = np.take_along_axis(candidate_rows, top, axis=1)
+            self.neighbour_scores = np.take_along_axis(candidate_scores, top, axis=1)
+
+            # Unchanged instruments outside a list never scored above its previous k-th score, so a
+            # list is still exact unless its k-th score dropped below that; those and the changed
+            # rows themselves are recomputed
+            stale = self.neighbour_scores.min(axis=1) < previous_kth
+            stale[rows] = True
+            self._refresh_neighbours(np.flatnonzero(stale))
+
+    def _refresh_neighbours(self, rows):
+        """
+        Recompute the exact top-k neighbour lists of rows
+        """
+        k = self.neighbour_rows.shape[1]
+        if len(rows) == 0 or k == 0:
+            return
+
+        block = self._cosine_block(rows)
+        block[np.arange(len(rows)), rows] = -np.inf
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        self.neighbour_rows[rows] = top
+        self.neighbour_scores[rows] = np.take_along_axis(block, top, axis=1)
+
+    def _build_neighbour_graph(self, chunk_size=1024):
+        """
+        Keep only the top_k strongest neighbours of every instrument, computed a chunk of rows at a time
+        """
+        n_instruments = len(self.normalized_features)
+        k = min(self.top_k, max(n_instruments - 1, 0))
+        self.neighbour_rows = np.empty((n_instruments, k), dtype=np.intp)
+        self.neighbour_scores = np.empty((n_instruments, k), dtype=self.dtype)
+        if k == 0:
+            return
+
+        for start in range(0, n_instruments, chunk_size):
+            self._refresh_neighbours(np.arange(start, min(start + chunk_size, n_instruments)))
+
+    def _self_similarity(self, rows):
+        """
+        Similarity of each instrument with itself (1, or 0 for an all-zero feature vector)
+        """
+        vectors = self.normalized_features[rows]
+        return np.einsum('ij,ij->i', vectors, vectors) + self.sector_weights[rows] ** 2
+
+    def _similarity_block(self, rows, cols=None):
+        """
+        Similarities between instruments at rows and cols (all instruments if cols is None)
+        as a dense len(rows) x len(cols) block
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+
+        if self.similarity == 'dense':
+            if cols is None:
+                return self.similarity_matrix[rows]
+            return self.similarity_matrix[np.ix_(rows, np.asarray(cols, dtype=np.intp))]
+
+        if self.similarity == 'on_demand':
+            return self._cosine_block(rows, cols)
+
+        # top_k: scatter the pruned neighbour lists back into dense rows
+        block = np.zeros((len(rows), len(self.instrument_ids)), dtype=self.dtype)
+        np.put_along_axis(block, self.neighbour_rows[rows], self.neighbour_scores[rows], axis=1)
+        block[np.arange(len(rows)), rows] = self._self_similarity(rows)
+        return block if cols is None else block[:, cols]
+
+    def _neighbour_graph(self):
+        """
+        Sparse N x N matrix of the pruned top_k similarities, including self-similarity
+        """
+        n_instruments, k = self.neighbour_rows.shape
+        return csr_matrix(
+            (
+                np.column_stack([self._self_similarity(slice(None)), self.neighbour_scores]).ravel(),
+                np.column_stack([np.arange(n_instruments), self.neighbour_rows]).ravel(),
+                np.arange(0, n_instruments * (k + 1) + 1, k + 1)
+            ),
+            shape=(n_instruments, n_instruments)
+        )
+
+    def _score_holdings(self, holdings):
+        """
+        Weighted sum of similarity rows for each row of a sparse user x instrument holdings matrix
+        """
+        if self.similarity == 'dense':
+            return np.asarray(holdings @ self.similarity_matrix)
+
+        if self.similarity == 'on_demand':
+            # (H V) V^T plus the per-sector profile term never builds the N x N similarity matrix
+            profiles = np.asarray(holdings @ self.normalized_features)
+            scores = profiles @ self.normalized_features.T
+            # A few users at a time, so the sector term never needs a full-size temporary
+            sector_profiles = self._sector_profiles(holdings)
+            sector_codes = np.maximum(self.sector_codes, 0)
+            for start in range(0, len(scores), 64):
+                block = slice(start, start + 64)
+                scores[block] += sector_profiles[block][:, sector_codes] * self.sector_weights
+            return scores
+
+        return (holdings @ self._neighbour_graph()).toarray()
+
+    def _sector_profiles(self, holdings):
+        """
+        Users x sectors sums of the held instruments' sector column values, the sector half of
+        holdings @ feature vectors
+        """
+        n_users = holdings.shape[0]
+        n_sectors = max(len(self.sector_columns), 1)
+        users = np.repeat(np.arange(n_users), np.diff(holdings.indptr))
+        return np.bincount(
+            users * n_sectors + np.maximum(self.sector_codes[holdings.indices], 0),
+            weights=holdings.data * self.sector_weights[holdings.indices],
+            minlength=n_users * n_sectors
+        ).reshape(n_users, n_sectors)
+
+    def _rows_for(self, instrument_ids):
+        """
+        Map instrument ids to similarity matrix rows
+        """
+        try:
+            return np.fromiter(
+                (self.instrument_index[instrument_id] for instrument_id in instrument_ids),
+                dtype=np.intp
+            )
+        except KeyError as e:
+            raise ValueError(f"Instrument not found: {e.args[0]}")
+        
+    def _top_n(self, scores, n):
+        """
+        Select the n highest finite scores with a partial selection instead of a full sort.
+        Ties are broken by row order so results match a stable descending sort.
+        """
+        candidates = np.flatnonzero(np.isfinite(scores))
+        n = min(n, len(candidates))
+        if n <= 0:
+            return []
+        
+        candidate_scores = scores[candidates]
+        if n < len(candidates):
+            # Everything above the n-th largest score is in, ties at the boundary go by row order
+            kth_score = np.partition(candidate_scores, len(candidates) - n)[len(candidates) - n]
+            above = np.flatnonzero(candidate_scores > kth_score)
+            tied = np.flatnonzero(candidate_scores == kth_score)[:n - len(above)]
+            selected = np.concatenate([above, tied])
+            candidates, candidate_scores = candidates[selected], candidate_scores[selected]
+        
+        order = np.lexsort((candidates, -candidate_scores))
+        return [
+            (self.instrument_ids[candidates[i]], float(candidate_scores[i]))
+            for i in order
+        ]
+    
+    def _top_n_rows(self, scores, n):
+        """
+        _top_n of every row of a users x instruments score block, selected for all rows at once:
+        non-finite scores are left out and ties at the boundary go by row order.
+        scores is overwritten.
+        """
+        n_users, n_instruments = scores.shape
+        n = min(n, n_instruments)
+        if n <= 0:
+            return [[] for _ in range(n_users)]
+        
+        scores[~np.isfinite(scores)] = -np.inf
+        kth_scores = np.partition(scores, n_instruments - n, axis=1)[:, [n_instruments - n]]
+        above = scores > kth_scores
+        tied = scores == kth_scores
+        tied &= np.cumsum(tied, axis=1, dtype=np.int32) <= n - above.sum(axis=1, keepdims=True)
+        above |= tied
+        above &= scores > -np.inf
         
-        # Calculate similarity matrix
-        feature_matrix = np.array([features for features in self.instrument_features.values()])
-        self.similarity_matrix = cosine_similarity(feature_matrix)
+        users, candidates = np.nonzero(above)
+        candidate_scores = scores[users, candidates]
+        order = np.lexsort((candidates, -candidate_scores, users))
+        candidates = candidates[order].tolist()
+        candidate_scores = candidate_scores[order].tolist()
+        bounds = np.searchsorted(users[order], np.arange(n_users + 1)).tolist()
+        return [
+            [(self.instrument_ids[row], score) for row, score in zip(candidates[start:end], candidate_scores[start:end])]
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
         
     def get_recommendations(self, user_id, n_recommendations=5):
         """
@@ -55,48 +748,201 @@ class FinancialRecommender:
         if user_id not in self.user_holdings:
             raise ValueError("User holdings not found")
             
-        # Get user's current holdings
-        current_holdings = set(self.user_holdings[user_id].keys())
+        if self.result_cache is None:
+            return self._recommend(user_id, n_recommendations)
+        
+        key = ('recommendations', self._holdings_key(user_id), n_recommendations, self.model_version)
+        recommendations = self.result_cache.get(key)
+        if recommendations is MISSING:
+            recommendations = self._recommend(user_id, n_recommendations)
+            self.result_cache.put(key, recommendations)
+        return list(recommendations)
+    
+    def _recommend(self, user_id, n_recommendations):
+        """
+        Score and rank candidates for a user, uncached
+        """
+        # Get rows of user's current holdings
+        held_rows, weights = self._held_rows(self.user_holdings[user_id])
+        if len(held_rows) == 0:
+            return []
+        
+        if self.neighbour_index is not None:
+            return self._index_recommendations(held_rows, weights, n_recommendations)
+        
+        # Score every candidate at once as a (weighted) row sum over the held instruments
+        if self.similarity == 'on_demand':
+            held_weights = np.ones(len(held_rows)) if weights is None else weights
+            holdings = csr_matrix(
+                (held_weights.astype(self.dtype), held_rows, [0, len(held_rows)]),
+                shape=(1, len(self.instrument_ids))
+            )
+            scores = self._score_holdings(holdings)[0]
+        else:
+            block = self._similarity_block(held_rows)
+            scores = block.sum(axis=0) if weights is None else weights @ block
+        
+        # Held instruments are never recommended
+        scores[held_rows] = -np.inf
+        
+        return self._top_n(scores, n_recommendations)
+    
+    def _index_recommendations(self, held_rows, weights, n_recommendations):
+        """
+        Score only candidates found through the neighbour index, re-scored exactly against all
+        holdings so each gets the same weighted sum as in the matrix path. A candidate's score is
+        the dot product of its unit vector with the weighted sum of the held unit vectors, so the
+        neighbours of that profile vector are the best candidates; the nearest neighbours of
+        every holding are added to make up for an approximate index's misses.
+        """
+        held_ids = [self.instrument_ids[row] for row in held_rows]
+        held_vectors = self.neighbour_index.vectors_for(held_ids)
+        profile = held_vectors.sum(axis=0) if weights is None else weights @ held_vectors
+        neighbours = self.neighbour_index.search(
+            np.vstack([held_vectors, profile]),
+            max(self.n_neighbours, n_recommendations) + len(held_ids)
+        )
+        
+        candidates = {instrument_id for held_neighbours in neighbours for instrument_id, _ in held_neighbours}
+        candidate_rows = np.setdiff1d(self._rows_for(candidates), held_rows)
+        if len(candidate_rows) == 0:
+            return []
+        
+        block = self._cosine_block(held_rows, candidate_rows)
+        scores = np.full(len(self.instrument_ids), -np.inf)
+        scores[candidate_rows] = block.sum(axis=0) if weights is None else weights @ block
+        
+        # Same selection and ordering as the matrix path: score descending, ties by row
+        return self._top_n(scores, n_recommendations)
+    
+    def _holdings_matrix(self, user_ids):
+        """
+        Build a sparse user x instrument matrix with the weight (1 when unweighted) of every held instrument
+        """
+        indptr = [0]
+        indices = []
+        data = []
+        for user_id in user_ids:
+            if user_id not in self.user_holdings:
+                raise ValueError(f"User holdings not found: {user_id}")
+            rows, weights = self._held_rows(self.user_holdings[user_id])
+            indices.append(rows)
+            data.append(np.ones(len(rows)) if weights is None else weights)
+            indptr.append(indptr[-1] + len(rows))
+            
+        indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.intp)
+        data = np.concatenate(data).astype(self.dtype) if data else np.empty(0, dtype=self.dtype)
+        return csr_matrix(
+            (data, indices, indptr),
+            shape=(len(user_ids), len(self.instrument_ids))
+        )
+    
+    def get_recommendations_batch(self, user_ids=None, n_recommendations=5, chunk_size=None,
+                                  max_chunk_bytes=256 * 2**20):
+        """
+        Generate recommendations for many users, scoring chunk_size users per matrix product.
+        Yields (user_id, recommendations) pairs as each chunk finishes; peak memory is
+        bounded by a chunk_size x n_instruments score block.
+        user_ids: iterable of user ids, defaults to every user in user_holdings
+        chunk_size: defaults to as many users as keep a chunk's scores within max_chunk_bytes
+        """
+        if user_ids is None:
+            user_ids = list(self.user_holdings.keys())
+        user_ids = iter(user_ids)
+        
+        if self.neighbour_index is not None:
+            # Neighbour lists are per holding, so there is no user x instrument product to batch
+            for user_id in user_ids:
+                yield user_id, self.get_recommendations(user_id, n_recommendations)
+            return
         
-        # Calculate recommendation scores
-        recommendation_scores = defaultdict(float)
+        if chunk_size is None:
+            chunk_size = max(1, max_chunk_bytes // (BATCH_BYTES_PER_SCORE * max(len(self.instrument_ids), 1)))
         
-        for held_instrument in current_holdings:
-            held_idx = list(self.instrument_features.keys()).index(held_instrument)
+        while True:
+            chunk = list(islice(user_ids, chunk_size))
+            if not chunk:
+                return
+            
+            # Score the whole chunk as one sparse x dense product
+            holdings = self._holdings_matrix(chunk)
+            scores = self._score_holdings(holdings)
             
-            # Get similar instruments
-            similarities = self.similarity_matrix[held_idx]
+            # Held instruments are never recommended, including zero-weight holdings
+            held_users = np.repeat(np.arange(len(chunk)), np.diff(holdings.indptr))
+            scores[held_users, holdings.indices] = -np.inf
             
-            # Add similarity scores to recommendation scores
-            for idx, score in enumerate(similarities):
-                instrument_id = list(self.instrument_features.keys())[idx]
-                if instrument_id not in current_holdings:
-                    recommendation_scores[instrument_id] += score
-                    
-        # Sort recommendations by score
-        recommendations = sorted(
-            recommendation_scores.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:n_recommendations]
-        
-        return recommendations
+            # Same selection and ordering as get_recommendations, for the whole chunk at once
+            recommendations = self._top_n_rows(scores, n_recommendations)
+            
+            for i, user_id in enumerate(chunk):
+                if holdings.indptr[i] == holdings.indptr[i + 1]:
+                    yield user_id, []
+                    continue
+                yield user_id, recommendations[i]
     
     def explain_recommendation(self, recommended_id, user_holdings):
         """
         Provide explanation for why an instrument was recommended
         """
-        rec_idx = list(self.instrument_features.keys()).index(recommended_id)
-        explanations = []
+        if self.result_cache is None:
+            return self._explain(recommended_id, user_holdings)
         
-        for held_id in user_holdings:
-            held_idx = list(self.instrument_features.keys()).index(held_id)
-            similarity = self.similarity_matrix[held_idx][rec_idx]
-            
-            if similarity > 0.7:  # Threshold for significant similarity
-                explanations.append(f"Similar to your holding {held_id} (similarity: {similarity:.2f})")
-                
-        return explanations
+        key = ('explain', tuple(user_holdings), recommended_id, self.model_version)
+        explanations = self.result_cache.get(key)
+        if explanations is MISSING:
+            explanations = self._explain(recommended_id, user_holdings)
+            self.result_cache.put(key, explanations)
+        return list(explanations)
+    
+    def _explain(self, recommended_id, user_holdings):
+        """
+        Explanation strings for one recommendation, uncached
+        """
+        explanation = self.explain_recommendations([recommended_id], user_holdings)[0]
+        return [
+            f"Similar to your holding {held_id} (similarity: {similarity:.2f})"
+            for held_id, similarity in explanation['similar_holdings']
+        ]
+    
+    def explain_recommendations(self, recommendations, user_holdings, threshold=0.7):
+        """
+        Explain a whole recommendation list at once from one holdings x recommendations
+        similarity block.
+        recommendations: instrument ids or (instrument_id, score) pairs as returned by get_recommendations
+        Returns one dict per recommendation, in order, with instrument_id, score (None when not
+        given) and similar_holdings: (held_id, similarity) pairs above threshold, in holdings order.
+        """
+        recommended_ids, scores = [], []
+        for recommendation in recommendations:
+            if isinstance(recommendation, tuple):
+                recommended_ids.append(recommendation[0])
+                scores.append(recommendation[1])
+            else:
+                recommended_ids.append(recommendation)
+                scores.append(None)
+        
+        held_ids = list(user_holdings)
+        if self.neighbour_index is not None:
+            block = self.neighbour_index.vectors_for(held_ids) @ self.neighbour_index.vectors_for(recommended_ids).T
+        elif self.similarity == 'dense':
+            block = self._similarity_block(self._rows_for(held_ids), self._rows_for(recommended_ids))
+        else:
+            # Exact similarities: the pruned top_k lists would count every pair outside them as 0
+            block = self._cosine_block(self._rows_for(held_ids), self._rows_for(recommended_ids))
+        
+        # Threshold the whole block at once, then walk only the significant pairs
+        rec_positions, held_positions = np.nonzero(np.asarray(block).T > threshold)
+        similar_holdings = [[] for _ in recommended_ids]
+        for rec_position, held_position in zip(rec_positions.tolist(), held_positions.tolist()):
+            similar_holdings[rec_position].append(
+                (held_ids[held_position], float(block[held_position, rec_position]))
+            )
+        
+        return [
+            {'instrument_id': instrument_id, 'score': score, 'similar_holdings': similar}
+            for instrument_id, score, similar in zip(recommended_ids, scores, similar_holdings)
+        ]
 
 # Example usage
 def demo_recommender():
@@ -0,0 +1,145 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from groq import APIConnectionError, APIStatusError
+
+# Status codes worth retrying: rate limited, timed out, conflicting and server-side failures
+RETRY_STATUS = {408, 409, 429}
+
+# Rough prompt size in tokens, for the tokens-per-minute budget (about four characters a token)
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(messages, max_tokens=0):
+    """
+    Tokens a chat completion is charged for: the prompt, estimated from its length, plus the
+    completion's max_tokens
+    """
+    return sum(len(message['content']) for message in messages) // CHARS_PER_TOKEN + (max_tokens or 0)
+
+
+def retry_after(error):
+    """
+    Seconds the server asked to wait before retrying (Retry-After header in seconds or as an
+    HTTP date), None if it did not say
+    """
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at rate_per_minute, holding at most capacity
+    (default: one minute's worth). Waiters are served first come, first served.
+    """
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """
+        Wait until amount tokens are available and take them; a request larger than the bucket
+        waits for a full bucket
+        """
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class LLMScheduler:
+    """
+    Runs chat completions on an async client (e.g. groq.AsyncGroq(max_retries=0), so retries
+    happen here) with at most max_concurrency requests in flight, optional requests- and
+    tokens-per-minute budgets, and retries with jittered exponential backoff on rate limits,
+    timeouts, server errors and dropped connections. A 429 with Retry-After pauses every
+    request, not just the one that was refused. stats counts requests, retries and 429s.
+    """
+    def __init__(self, client, max_concurrency=8, requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=5, base_delay=0.5, max_delay=30.0):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0}
+        self._semaphore = None
+        self._resume_at = 0.0
+
+    def _retry_delay(self, attempt, error):
+        """
+        Seconds to wait before retry number attempt (from 0): the server's Retry-After plus a
+        little jitter when given, otherwise full-jitter exponential backoff
+        """
+        delay = retry_after(error)
+        if delay is not None:
+            return delay + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @staticmethod
+    def _retryable(error):
+        if isinstance(error, APIStatusError):
+            return error.status_code in RETRY_STATUS or error.status_code >= 500
+        return isinstance(error, APIConnectionError)
+
+    async def complete(self, messages, **kwargs):
+        """
+        The client's chat completion for messages, retried until it succeeds or max_retries is
+        used up (then the last error is raised)
+        """
+        # Created lazily so the scheduler can be built outside the event loop it runs on
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        cost = estimate_tokens(messages, kwargs.get('max_tokens'))
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                while self._resume_at > time.monotonic():
+                    await asyncio.sleep(self._resume_at - time.monotonic())
+                if self.requests is not None:
+                    await self.requests.acquire()
+                if self.tokens is not None:
+                    await self.tokens.acquire(cost)
+
+                self.stats['requests'] += 1
+                try:
+                    return await self.client.chat.completions.create(messages=messages, **kwargs)
+                except (APIStatusError, APIConnectionError) as error:
+                    if not self._retryable(error) or attempt >= self.max_retries:
+                        raise
+                    delay = self._retry_delay(attempt, error)
+                    if getattr(error, 'status_code', None) == 429:
+                        self.stats['rate_limited'] += 1
+                        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+            # Back off outside the semaphore so other requests can use the slot meanwhile
+            self.stats['retries'] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,202 @@
+import json
+import os
+import shutil
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+import snapshotFiles
+
+# Calendar span covered by a yfinance period string, None meaning all available history
+PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1), '5d': pd.DateOffset(days=7), '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3), '6mo': pd.DateOffset(months=6), '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2), '5y': pd.DateOffset(years=5), '10y': pd.DateOffset(years=10),
+    'max': None
+}
+
+
+class CachedMarketDataSource:
+    """
+    On-disk OHLCV cache in front of another market data source (e.g. marketDataSource.YFinanceSource),
+    usable anywhere a data source is, e.g. SectorRecommender(CachedMarketDataSource(YFinanceSource())).
+
+    Bars are stored column-wise per (interval, ticker) as a dates .npy (int64 epoch ns) and a values
+    .npy (float64, one column per field), memory-mapped on read. Every write goes to a new
+    generation directory, so frames already returned never change underneath. Entries younger
+    than ttl seconds are served as is; older ones only fetch the tail after their last stored bar.
+    The cache is kept under max_bytes by evicting least recently used entries, entries unused for
+    expire_after seconds are dropped, and offline=True serves entirely from the cache.
+    """
+    def __init__(self, source, cache_dir='.market_cache', ttl=3600, max_bytes=512 * 2**20,
+                 expire_after=None, offline=False):
+        self.source = source
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.expire_after = expire_after
+        self.offline = offline
+        self.stats = {'hits': 0, 'delta_fetches': 0, 'full_fetches': 0}
+
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, 'index.json')
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+
+    def download(self, tickers, period='1mo', interval='1d', start=None):
+        """
+        Same interface as the wrapped source; only bars missing from the cache are downloaded
+        """
+        now = time.time()
+        if start is not None:
+            window_start = pd.Timestamp(start)
+        elif PERIOD_OFFSETS.get(period) is not None:
+            window_start = pd.Timestamp.now().normalize() - PERIOD_OFFSETS[period]
+        else:
+            window_start = None
+
+        fresh, full, tails = [], [], defaultdict(list)
+        for ticker in tickers:
+            entry = self.index.get(self._key(ticker, interval))
+            covered = entry is not None and (
+                entry['covered_from'] is None or
+                (window_start is not None and entry['covered_from'] <= window_start.value)
+            )
+            if self.offline:
+                if entry is None:
+                    raise LookupError(f"{ticker} ({interval}) is not cached and the cache is offline")
+                fresh.append(ticker)
+            elif covered and now - entry['fetched_at'] < self.ttl:
+                fresh.append(ticker)
+            elif covered:
+                # Re-fetch from the last stored bar, which may have been incomplete
+                tails[entry['last']].append(ticker)
+            else:
+                full.append(ticker)
+
+        self.stats['hits'] += len(fresh)
+        if full:
+            self.stats['full_fetches'] += len(full)
+            fetched = self.source.download(full, period=period, interval=interval, start=start)
+            for ticker, frame in fetched.items():
+                self._write(ticker, interval, frame, window_start, now, merge=False)
+        for last, group in tails.items():
+            self.stats['delta_fetches'] += len(group)
+            fetched = self.source.download(group, period=period, interval=interval, start=pd.Timestamp(last))
+            for ticker, frame in fetched.items():
+                self._write(ticker, interval, frame, None, now, merge=True)
+
+        frames = {}
+        for ticker in tickers:
+            frame = self._read(ticker, interval, now)
+            if frame is not None:
+                frames[ticker] = frame if window_start is None else frame.loc[window_start:]
+
+        self._evict(now)
+        return frames
+
+    def clear(self):
+        """
+        Remove every cached entry
+        """
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.index = {}
+
+    def _key(self, ticker, interval):
+        return f"{interval}/{ticker.replace(os.sep, '_')}"
+
+    def _read(self, ticker, interval, now):
+        key = self._key(ticker, interval)
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+
+        # Entries written before generations keep their files directly under the key
+        path = os.path.join(self.cache_dir, key, entry.get('generation', ''))
+        try:
+            dates = np.load(os.path.join(path, 'dates.npy'), mmap_mode='r')
+            values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r')
+        except FileNotFoundError:
+            # Replaced by another process sharing the cache directory since its index was read
+            return None
+        with self._lock:
+            entry['accessed_at'] = now
+        return pd.DataFrame(
+            values, index=pd.DatetimeIndex(dates, name='Date'), columns=entry['columns'], copy=False
+        )
+
+    def _write(self, ticker, interval, frame, window_start, now, merge):
+        key = self._key(ticker, interval)
+        entry = self.index.get(key)
+        if merge and entry is not None:
+            # New bars replace overlapping stored ones
+            stored = self._read(ticker, interval, now)
+            frame = pd.concat([stored, frame[stored.columns]])
+            frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+            covered_from = entry['covered_from']
+        else:
+            covered_from = window_start.value if window_start is not None else None
+
+        if frame.empty:
+            return
+
+        # Stored as naive UTC epoch nanoseconds
+        index = frame.index.tz_convert(None) if frame.index.tz is not None else frame.index
+        dates = index.as_unit('ns').asi8
+        values = frame.to_numpy(dtype=np.float64)
+
+        # A new generation per write: frames already returned stay mapped to the old files,
+        # which are unlinked rather than overwritten
+        path = os.path.join(self.cache_dir, key)
+        generation = snapshotFiles.new_generation(path)
+        np.save(os.path.join(path, generation, 'dates.npy'), dates)
+        np.save(os.path.join(path, generation, 'values.npy'), values)
+
+        with self._lock:
+            self.index[key] = {
+                'generation': generation,
+                'columns': list(frame.columns),
+                'covered_from': covered_from,
+                'last': int(dates[-1]),
+                'fetched_at': now,
+                'accessed_at': now,
+                'nbytes': int(dates.nbytes + values.nbytes)
+            }
+        snapshotFiles.remove_generations(path, keep=generation)
+        for name in ('dates.npy', 'values.npy'):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+
+    def _evict(self, now):
+        with self._lock:
+            expired = [
+                key for key, entry in self.index.items()
+                if self.expire_after is not None and now - entry['accessed_at'] > self.expire_after
+            ]
+
+            # Least recently used entries go first until the cache fits in max_bytes
+            total = sum(entry['nbytes'] for key, entry in self.index.items() if key not in expired)
+            for key, entry in sorted(self.index.items(), key=lambda item: item[1]['accessed_at']):
+                if total <= self.max_bytes:
+                    break
+                if key not in expired:
+                    expired.append(key)
+                    total -= entry['nbytes']
+
+            for key in expired:
+                del self.index[key]
+                shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+            tmp_path = self._index_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self._index_path)
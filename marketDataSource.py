@@ -0,0 +1,164 @@
+import random
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+# Approximate number of daily bars in a yfinance period string
+PERIOD_DAYS = {
+    '1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126,
+    '1y': 252, '2y': 504, '5y': 1260, '10y': 2520
+}
+
+# Errors that retrying cannot fix, e.g. a ticker missing from an offline marketDataCache
+NON_RETRYABLE = (LookupError,)
+
+
+class YFinanceSource:
+    """
+    Market data source backed by yfinance multi-ticker downloads
+    """
+    def download(self, tickers, period='1mo', interval='1d', start=None):
+        """
+        Download OHLCV bars for tickers in one request, for the last period or from start onwards.
+        Returns a dict of ticker -> DataFrame with Open/High/Low/Close/Adj Close/Volume columns.
+        """
+        import yfinance as yf
+
+        window = {'start': start} if start is not None else {'period': period}
+        data = yf.download(
+            list(tickers), interval=interval, group_by='ticker',
+            auto_adjust=False, threads=False, progress=False, **window
+        )
+        return split_tickers(data, tickers)
+
+
+class FakeMarketDataSource:
+    """
+    Local, deterministic market data source for tests and offline runs.
+    Each ticker gets its own seeded random walk; latency simulates a network round-trip per
+    request and fail_tickers raise for any request that includes them.
+    """
+    # First bar of every generated series, so overlapping requests see identical prices
+    origin = pd.Timestamp('2000-01-03')
+
+    def __init__(self, latency=0.0, fail_tickers=(), end=None):
+        self.latency = latency
+        self.fail_tickers = set(fail_tickers)
+        self.end = pd.Timestamp(end) if end is not None else pd.Timestamp.now().normalize()
+        self.requests = 0
+
+    def download(self, tickers, period='1mo', interval='1d', start=None):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        failing = self.fail_tickers.intersection(tickers)
+        if failing:
+            raise ConnectionError(f"Fake download failed for {sorted(failing)}")
+
+        if start is None:
+            last_day = np.busday_offset(self.end.date(), 0, roll='backward')
+            start = pd.Timestamp(np.busday_offset(last_day, 1 - PERIOD_DAYS.get(period, 21)))
+        return {ticker: self.history(ticker).loc[pd.Timestamp(start):self.end] for ticker in tickers}
+
+    def history(self, ticker):
+        days = np.arange(self.origin.date(), self.end.date() + pd.Timedelta(days=1), dtype='datetime64[D]')
+        dates = days[np.is_busday(days)]
+        n = len(dates)
+
+        # One stream per field, so a longer history extends a shorter one instead of reshuffling it
+        seed = zlib.crc32(ticker.encode())
+        rngs = [np.random.default_rng([seed, field]) for field in range(4)]
+        close = rngs[0].uniform(20, 500) * np.exp(np.cumsum(rngs[0].normal(0.0003, 0.015, n)))
+        spread = close * rngs[1].uniform(0, 0.01, n)
+        return pd.DataFrame({
+            'Open': close + rngs[2].normal(0, 1, n) * spread,
+            'High': close + spread,
+            'Low': close - spread,
+            'Close': close,
+            'Adj Close': close,
+            'Volume': rngs[3].integers(1_000_000, 50_000_000, n).astype(float)
+        }, index=pd.DatetimeIndex(dates, name='Date'))
+
+
+def split_tickers(data, tickers):
+    """
+    Split a (possibly multi-ticker, MultiIndex-column) yfinance frame into one frame per ticker
+    """
+    if not isinstance(data.columns, pd.MultiIndex):
+        return {tickers[0]: data} if len(tickers) == 1 else {}
+
+    level = 0 if set(tickers) & set(data.columns.get_level_values(0)) else 1
+    frames = {}
+    for ticker in tickers:
+        if ticker in data.columns.get_level_values(level):
+            frames[ticker] = data.xs(ticker, axis=1, level=level).dropna(how='all')
+    return frames
+
+
+class MarketDataFetcher:
+    """
+    Fetch many tickers through a market data source: tickers are grouped into multi-ticker
+    batches that are downloaded concurrently on a bounded thread pool. A failed batch is split
+    into single tickers, which are retried with exponential backoff (except NON_RETRYABLE errors,
+    reported at once), so one bad ticker only loses its own data.
+    """
+    def __init__(self, source=None, batch_size=25, max_workers=4, retries=2, backoff=1.0):
+        self.source = source if source is not None else YFinanceSource()
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+
+    def fetch(self, tickers, period='1mo', interval='1d'):
+        """
+        Fetch every ticker, returns (data, errors): dicts of ticker -> DataFrame and ticker -> exception
+        """
+        data, errors = {}, {}
+        for batch_data, batch_errors in self.iter_fetch(tickers, period, interval):
+            data.update(batch_data)
+            errors.update(batch_errors)
+        return data, errors
+
+    def iter_fetch(self, tickers, period='1mo', interval='1d'):
+        """
+        Fetch every ticker, yielding (data, errors) per batch as soon as it completes, so callers
+        can start working on early batches while later ones are still downloading
+        """
+        tickers = list(dict.fromkeys(tickers))
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+        if not batches:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            futures = [executor.submit(self._fetch_batch, batch, period, interval) for batch in batches]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _fetch_batch(self, batch, period, interval):
+        if len(batch) > 1:
+            try:
+                return self.source.download(batch, period=period, interval=interval), {}
+            except Exception:
+                # Isolate the failing tickers by fetching them one at a time
+                data, errors = {}, {}
+                for ticker in batch:
+                    ticker_data, ticker_errors = self._fetch_batch([ticker], period, interval)
+                    data.update(ticker_data)
+                    errors.update(ticker_errors)
+                return data, errors
+
+        for attempt in range(self.retries + 1):
+            try:
+                return self.source.download(batch, period=period, interval=interval), {}
+            except NON_RETRYABLE as e:
+                return {}, {batch[0]: e}
+            except Exception as e:
+                error = e
+                if attempt < self.retries:
+                    # Exponential backoff with jitter so concurrent batches do not retry in lockstep
+                    time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+        return {}, {batch[0]: error}
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+
+
+class MarketDataStore:
+    """
+    Columnar market data: one int64 epoch-nanosecond date index shared by every instrument,
+    float32 dates x instruments price and volume arrays (NaN where an instrument has no bar),
+    and int-coded instruments and sectors (instrument_ids[i] is column i, its sector is
+    sectors[sector_codes[i]], -1 when unknown).
+
+    Date windows are views of the same arrays, and the store saves to / loads from Parquet
+    (requires pyarrow). Accepted directly by sectorBasedRecommendAdded.FinancialRecommender.add_market_data
+    and yfinanaceLibrary.SectorRecommender.calculate_sector_metrics.
+    """
+    def __init__(self, dates, instrument_ids, prices, volumes, sectors=(), sector_codes=None):
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.instrument_ids = list(instrument_ids)
+        self.prices = np.asarray(prices, dtype=np.float32)
+        self.volumes = np.asarray(volumes, dtype=np.float32)
+        self.sectors = list(sectors)
+        if sector_codes is None:
+            sector_codes = np.full(len(self.instrument_ids), -1)
+        self.sector_codes = np.asarray(sector_codes, dtype=np.int32)
+
+        if self.prices.shape != (len(self.dates), len(self.instrument_ids)) or self.volumes.shape != self.prices.shape:
+            raise ValueError("prices and volumes must be shaped (number of dates, number of instruments)")
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + self.prices.nbytes + self.volumes.nbytes + self.sector_codes.nbytes
+
+    @classmethod
+    def from_long(cls, market_data):
+        """
+        Build from long-format rows with date, instrument_id, sector, price and volume columns
+        (the add_market_data layout). Each instrument keeps the sector of its first row.
+        """
+        dates = pd.to_datetime(market_data['date']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        date_index, date_codes = np.unique(dates, return_inverse=True)
+        instrument_codes, instrument_ids = pd.factorize(market_data['instrument_id'])
+        row_sector_codes, sectors = pd.factorize(market_data['sector'], sort=True)
+        first_rows = np.unique(instrument_codes, return_index=True)[1]
+
+        shape = (len(date_index), len(instrument_ids))
+        prices = np.full(shape, np.nan, dtype=np.float32)
+        volumes = np.full(shape, np.nan, dtype=np.float32)
+        prices[date_codes, instrument_codes] = market_data['price'].to_numpy()
+        volumes[date_codes, instrument_codes] = market_data['volume'].to_numpy()
+
+        return cls(date_index, instrument_ids, prices, volumes, sectors, row_sector_codes[first_rows])
+
+    @classmethod
+    def from_frames(cls, frames, sectors=None, price='Adj Close', volume='Volume'):
+        """
+        Build from a dict of instrument id -> OHLCV DataFrame (e.g. SectorRecommender.fetch_sector_data
+        or MarketDataFetcher.fetch); sectors optionally maps instrument id -> sector
+        """
+        frames = {instrument_id: frame for instrument_id, frame in frames.items() if not frame.empty}
+        index = pd.DatetimeIndex([])
+        for frame in frames.values():
+            index = index.union(frame.index)
+        if index.tz is not None:
+            index = index.tz_convert(None)
+
+        prices = np.full((len(index), len(frames)), np.nan, dtype=np.float32)
+        volumes = np.full((len(index), len(frames)), np.nan, dtype=np.float32)
+        for column, frame in enumerate(frames.values()):
+            frame_index = frame.index.tz_convert(None) if frame.index.tz is not None else frame.index
+            rows = index.get_indexer(frame_index)
+            prices[rows, column] = frame[price].to_numpy()
+            volumes[rows, column] = frame[volume].to_numpy()
+
+        sector_codes, sector_names = None, ()
+        if sectors is not None:
+            sector_codes, sector_names = pd.factorize(pd.Series([sectors.get(key) for key in frames]), sort=True)
+        return cls(index.as_unit('ns').asi8, frames, prices, volumes, sector_names, sector_codes)
+
+    def window(self, start=None, end=None):
+        """
+        Bars with start <= date <= end, sharing memory with this store
+        """
+        first = 0 if start is None else np.searchsorted(self.dates, pd.Timestamp(start).value, side='left')
+        last = len(self.dates) if end is None else np.searchsorted(self.dates, pd.Timestamp(end).value, side='right')
+        return MarketDataStore(
+            self.dates[first:last], self.instrument_ids, self.prices[first:last], self.volumes[first:last],
+            self.sectors, self.sector_codes
+        )
+
+    def last(self, days):
+        """
+        View of the bars within `days` calendar days of the latest date
+        """
+        if len(self.dates) == 0:
+            return self
+        return self.window(start=pd.Timestamp(self.dates[-1]) - pd.Timedelta(days=days))
+
+    def price_frame(self):
+        """
+        Dates x instruments DataFrame over the price array, without copying
+        """
+        return pd.DataFrame(self.prices, index=self._date_index(), columns=self.instrument_ids, copy=False)
+
+    def volume_frame(self):
+        """
+        Dates x instruments DataFrame over the volume array, without copying
+        """
+        return pd.DataFrame(self.volumes, index=self._date_index(), columns=self.instrument_ids, copy=False)
+
+    def long_arrays(self):
+        """
+        Every bar as flat (dates, instrument_codes, sector_codes, prices, volumes) arrays,
+        sorted by instrument and then date
+        """
+        prices = self.prices.T.ravel()
+        valid = ~np.isnan(prices)
+        instrument_codes = np.repeat(np.arange(len(self.instrument_ids)), len(self.dates))[valid]
+        return (
+            np.tile(self.dates, len(self.instrument_ids))[valid],
+            instrument_codes,
+            self.sector_codes[instrument_codes],
+            prices[valid],
+            self.volumes.T.ravel()[valid]
+        )
+
+    def to_long(self):
+        """
+        Long-format DataFrame with date, instrument_id, sector, price and volume columns
+        """
+        dates, instrument_codes, sector_codes, prices, volumes = self.long_arrays()
+        return pd.DataFrame({
+            'date': pd.DatetimeIndex(dates.view('datetime64[ns]')),
+            'instrument_id': pd.Categorical.from_codes(instrument_codes, categories=self.instrument_ids),
+            'sector': pd.Categorical.from_codes(sector_codes, categories=self.sectors),
+            'price': prices,
+            'volume': volumes
+        })
+
+    def to_arrow(self):
+        """
+        Arrow table of the bars in long format, instruments and sectors dictionary-encoded
+        """
+        import pyarrow as pa
+
+        dates, instrument_codes, sector_codes, prices, volumes = self.long_arrays()
+        return pa.table({
+            'date': pa.array(dates, type=pa.int64()).cast(pa.timestamp('ns')),
+            'instrument_id': pa.DictionaryArray.from_arrays(
+                pa.array(instrument_codes, type=pa.int32()), pa.array(self.instrument_ids, type=pa.string())
+            ),
+            'sector': pa.DictionaryArray.from_arrays(
+                pa.array(sector_codes, type=pa.int32(), mask=sector_codes < 0), pa.array(self.sectors, type=pa.string())
+            ),
+            'price': pa.array(prices, type=pa.float32()),
+            'volume': pa.array(volumes, type=pa.float32())
+        })
+
+    @classmethod
+    def from_arrow(cls, table):
+        """
+        Build from an Arrow table in the to_arrow layout
+        """
+        date_index, date_codes = np.unique(
+            table.column('date').cast('int64').to_numpy(), return_inverse=True
+        )
+        instruments = table.column('instrument_id').to_pandas().astype('category')
+        sectors = table.column('sector').to_pandas().astype('category')
+        instrument_codes = instruments.cat.codes.to_numpy()
+        first_rows = np.unique(instrument_codes, return_index=True)[1]
+
+        shape = (len(date_index), len(instruments.cat.categories))
+        prices = np.full(shape, np.nan, dtype=np.float32)
+        volumes = np.full(shape, np.nan, dtype=np.float32)
+        prices[date_codes, instrument_codes] = table.column('price').to_numpy()
+        volumes[date_codes, instrument_codes] = table.column('volume').to_numpy()
+
+        sector_codes = np.full(shape[1], -1)
+        sector_codes[instrument_codes[first_rows]] = sectors.cat.codes.to_numpy()[first_rows]
+        return cls(
+            date_index, list(instruments.cat.categories), prices, volumes,
+            list(sectors.cat.categories), sector_codes
+        )
+
+    def save(self, path):
+        """
+        Write the store to a Parquet file
+        """
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a store written by save()
+        """
+        import pyarrow.parquet as pq
+
+        return cls.from_arrow(pq.read_table(path))
+
+    def _date_index(self):
+        return pd.DatetimeIndex(self.dates.view('datetime64[ns]'), name='Date')
@@ -0,0 +1,291 @@
+from itertools import chain
+
+import numpy as np
+
+
+class NeighbourIndex:
+    """
+    Base class for cosine-similarity neighbour indexes keyed by instrument id.
+    Vectors are L2-normalized on insert and kept in slots; slots of removed ids are reused.
+    Subclasses decide which slots are scored for a query.
+    """
+    def __init__(self, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.reset()
+
+    def reset(self):
+        """
+        Drop every stored vector
+        """
+        self.slot_ids = []
+        self.slots = {}
+        self.vectors = np.empty((0, 0), dtype=self.dtype)
+        self.alive = np.empty(0, dtype=bool)
+        self._free_slots = []
+
+    def __len__(self):
+        return len(self.slots)
+
+    def snapshot(self):
+        """
+        JSON-serializable parameters and the arrays needed to restore the index with from_snapshot
+        """
+        params = {'dtype': self.dtype.str, 'slot_ids': self.slot_ids}
+        arrays = {
+            'vectors': self.vectors[:len(self.slot_ids)],
+            'alive': self.alive[:len(self.slot_ids)],
+        }
+        return params, arrays
+
+    @classmethod
+    def from_snapshot(cls, params, arrays):
+        """
+        Restore an index from snapshot(); arrays may be read-only memory maps, in which case the
+        restored index can be searched but not modified
+        """
+        index = cls.__new__(cls)
+        index._restore(params, arrays)
+        return index
+
+    def _restore(self, params, arrays):
+        self.dtype = np.dtype(params['dtype'])
+        self.slot_ids = list(params['slot_ids'])
+        self.slots = {
+            instrument_id: slot for slot, instrument_id in enumerate(self.slot_ids) if instrument_id is not None
+        }
+        self.vectors = arrays['vectors']
+        self.alive = arrays['alive']
+        self._free_slots = np.flatnonzero(~self.alive).tolist()
+
+    def __contains__(self, instrument_id):
+        return instrument_id in self.slots
+
+    def build(self, ids, vectors):
+        """
+        Rebuild the index from scratch
+        """
+        self.reset()
+        self.add(ids, vectors)
+
+    def add(self, ids, vectors):
+        """
+        Insert or replace vectors for ids; the index can be built up incrementally.
+        Vectors narrower than the index (e.g. before a new sector column existed) are zero-padded.
+        """
+        ids = list(ids)
+        vectors = np.asarray(vectors, dtype=self.dtype).reshape(len(ids), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        vectors = vectors / norms
+
+        if vectors.shape[1] > self.vectors.shape[1]:
+            self._grow_dimension(vectors.shape[1])
+        elif vectors.shape[1] < self.vectors.shape[1]:
+            vectors = np.pad(vectors, ((0, 0), (0, self.vectors.shape[1] - vectors.shape[1])))
+
+        slots = np.empty(len(ids), dtype=np.intp)
+        for i, instrument_id in enumerate(ids):
+            slot = self.slots.get(instrument_id)
+            if slot is not None:
+                self._unindex(np.array([slot]))
+            else:
+                slot = self._allocate_slot()
+                self.slots[instrument_id] = slot
+                self.slot_ids[slot] = instrument_id
+            slots[i] = slot
+
+        self.vectors[slots] = vectors
+        self.alive[slots] = True
+        self._index(slots)
+
+    def remove(self, ids):
+        """
+        Remove ids from the index, unknown ids are ignored
+        """
+        slots = np.array(
+            [self.slots.pop(instrument_id) for instrument_id in ids if instrument_id in self.slots],
+            dtype=np.intp
+        )
+        if len(slots) == 0:
+            return
+
+        self._unindex(slots)
+        self.alive[slots] = False
+        self.vectors[slots] = 0
+        for slot in slots:
+            self.slot_ids[slot] = None
+            self._free_slots.append(slot)
+
+    def vectors_for(self, ids):
+        """
+        Stored (normalized) vectors for ids
+        """
+        return self.vectors[[self.slots[instrument_id] for instrument_id in ids]]
+
+    def similarity(self, ids, other_id):
+        """
+        Cosine similarity of each of ids with other_id
+        """
+        return self.vectors_for(ids) @ self.vectors[self.slots[other_id]]
+
+    def search(self, vectors, k):
+        """
+        Find the k most similar stored ids for each query vector.
+        Returns one list of (instrument_id, similarity) pairs per query, best first.
+        """
+        queries = np.atleast_2d(np.asarray(vectors, dtype=self.dtype))
+        results = []
+        for query in queries:
+            candidates = self._candidates(query)
+            results.append(self._rank(candidates, self.vectors[candidates] @ query, k))
+        return results
+
+    def _rank(self, candidates, scores, k):
+        """
+        Top k candidate slots by score as (instrument_id, similarity) pairs
+        """
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
+        if k < len(candidates):
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return [
+            (self.slot_ids[slot], score)
+            for slot, score in zip(candidates[order].tolist(), scores[order].tolist())
+        ]
+
+    def _allocate_slot(self):
+        if self._free_slots:
+            return self._free_slots.pop()
+
+        slot = len(self.slot_ids)
+        if slot == len(self.vectors):
+            # Grow storage geometrically so incremental adds stay amortized O(1)
+            capacity = max(16, 2 * len(self.vectors))
+            vectors = np.zeros((capacity, self.vectors.shape[1]), dtype=self.dtype)
+            vectors[:slot] = self.vectors
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:slot] = self.alive
+            self.vectors, self.alive = vectors, alive
+        self.slot_ids.append(None)
+        return slot
+
+    def _grow_dimension(self, dimension):
+        self.vectors = np.pad(self.vectors, ((0, 0), (0, dimension - self.vectors.shape[1])))
+
+    def _index(self, slots):
+        pass
+
+    def _unindex(self, slots):
+        pass
+
+    def _candidates(self, query):
+        return np.flatnonzero(self.alive)
+
+
+class BruteForceIndex(NeighbourIndex):
+    """
+    Exact neighbour search: every stored vector is scored, one matrix product per batch of queries
+    """
+    def search(self, vectors, k):
+        queries = np.atleast_2d(np.asarray(vectors, dtype=self.dtype))
+        candidates = np.flatnonzero(self.alive)
+        block = queries @ self.vectors[candidates].T
+        return [self._rank(candidates, scores, k) for scores in block]
+
+
+class LSHIndex(NeighbourIndex):
+    """
+    Approximate neighbour search with random-hyperplane (SimHash) locality sensitive hashing.
+    Each of n_tables hashes a vector to n_bits sign bits; a query scores only the vectors sharing
+    a bucket with it in some table, plus n_probes neighbouring buckets per table (flipping the
+    least certain bits). Candidates are re-ranked with exact cosine similarity.
+    """
+    def __init__(self, n_tables=8, n_bits=16, n_probes=2, dtype=np.float32, seed=0):
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = n_probes
+        self._rng = np.random.default_rng(seed)
+        self._bit_values = 1 << np.arange(n_bits)
+        super().__init__(dtype=dtype)
+
+    def snapshot(self):
+        params, arrays = super().snapshot()
+        params.update({'n_tables': self.n_tables, 'n_bits': self.n_bits, 'n_probes': self.n_probes})
+        arrays.update({'planes': self.planes, 'slot_codes': self.slot_codes[:len(self.slot_ids)]})
+        return params, arrays
+
+    def _restore(self, params, arrays):
+        self.n_tables = params['n_tables']
+        self.n_bits = params['n_bits']
+        self.n_probes = params['n_probes']
+        self._rng = np.random.default_rng()
+        self._bit_values = 1 << np.arange(self.n_bits)
+        super()._restore(params, arrays)
+        self.planes = arrays['planes']
+        self.slot_codes = arrays['slot_codes']
+
+        # Rebuild the bucket dicts from the stored codes, one sort per table
+        alive_slots = np.flatnonzero(self.alive)
+        self.tables = []
+        for table_codes in self.slot_codes[alive_slots].T:
+            order = np.argsort(table_codes, kind='stable')
+            codes, starts = np.unique(table_codes[order], return_index=True)
+            buckets = np.split(alive_slots[order], starts[1:])
+            self.tables.append({code: bucket.tolist() for code, bucket in zip(codes.tolist(), buckets)})
+
+    def reset(self):
+        super().reset()
+        self.planes = np.empty((self.n_tables, self.n_bits, 0), dtype=self.dtype)
+        self.tables = [{} for _ in range(self.n_tables)]
+        self.slot_codes = np.empty((0, self.n_tables), dtype=np.int64)
+
+    def _grow_dimension(self, dimension):
+        # Existing vectors are zero in the new dimensions, so extending the planes keeps their codes
+        super()._grow_dimension(dimension)
+        extra = self._rng.standard_normal(
+            (self.n_tables, self.n_bits, dimension - self.planes.shape[2])
+        ).astype(self.dtype)
+        self.planes = np.concatenate([self.planes, extra], axis=2)
+
+    def _projections(self, vectors):
+        return np.einsum('tbd,nd->ntb', self.planes, vectors)
+
+    def _index(self, slots):
+        codes = (self._projections(self.vectors[slots]) > 0) @ self._bit_values
+        if len(self.slot_codes) < len(self.vectors):
+            self.slot_codes = np.pad(self.slot_codes, ((0, len(self.vectors) - len(self.slot_codes)), (0, 0)))
+        self.slot_codes[slots] = codes
+
+        for slot, slot_codes in zip(slots.tolist(), codes.tolist()):
+            for table, code in zip(self.tables, slot_codes):
+                table.setdefault(code, []).append(slot)
+
+    def _unindex(self, slots):
+        for slot in slots.tolist():
+            for table, code in zip(self.tables, self.slot_codes[slot].tolist()):
+                bucket = table[code]
+                bucket.remove(slot)
+                if not bucket:
+                    del table[code]
+
+    def _candidates(self, query):
+        projections = self._projections(query[np.newaxis])[0]
+        codes = (projections > 0) @ self._bit_values
+
+        # Multi-probe: also visit the buckets reached by flipping the bits closest to their hyperplane
+        uncertain_bits = np.argsort(np.abs(projections), axis=1)[:, :self.n_probes]
+
+        buckets = []
+        for table, code, bits in zip(self.tables, codes.tolist(), uncertain_bits.tolist()):
+            for probe in [code] + [code ^ (1 << bit) for bit in bits]:
+                bucket = table.get(probe)
+                if bucket:
+                    buckets.append(bucket)
+
+        # Buckets overlap heavily across tables, dedupe with a slot mask rather than a sort
+        seen = np.zeros(len(self.vectors), dtype=bool)
+        seen[np.fromiter(chain.from_iterable(buckets), dtype=np.intp)] = True
+        return np.flatnonzero(seen)
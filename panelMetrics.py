@@ -0,0 +1,150 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+RSI_WINDOW = 14
+
+# Weights of SectorRecommender.get_top_sectors' composite score
+COMPOSITE_WEIGHTS = {'momentum_score': 0.3, 'risk_adjusted_return': 0.3, 'rsi': 0.2, 'volume_trend': 0.2}
+
+
+def build_panel(frames, field):
+    """
+    Wide dates x tickers panel of one OHLCV field from a dict of per-ticker frames
+    """
+    series = [frame[field] for frame in frames.values()]
+    if not series:
+        return pd.DataFrame()
+    if all(column.index.equals(series[0].index) for column in series):
+        # Shared calendar: stack the columns directly instead of aligning every index
+        return pd.DataFrame(
+            np.column_stack([column.to_numpy(dtype=np.float64) for column in series]),
+            index=series[0].index, columns=list(frames)
+        )
+    return pd.concat(dict(zip(frames, series)), axis=1, sort=True)
+
+
+def _compact(values):
+    """
+    Move each column's non-NaN values to the top, keeping their order, so row i is the i-th
+    observation of every ticker regardless of which dates it traded on
+    Returns the compacted array and the number of observations per column.
+    """
+    valid = ~np.isnan(values)
+    order = np.argsort(~valid, axis=0, kind='stable')
+    return np.take_along_axis(values, order, axis=0), valid.sum(axis=0)
+
+
+def _at(values, positions):
+    """
+    values[positions[j], j] for every column j, NaN where the position is out of range
+    """
+    result = np.full(values.shape[1], np.nan)
+    columns = np.flatnonzero((positions >= 0) & (positions < len(values)))
+    result[columns] = values[positions[columns], columns]
+    return result
+
+
+def panel_metrics(prices, volumes=None, min_periods=5):
+    """
+    Sector metrics for every column of a dates x tickers price panel in one vectorized pass:
+    return, last_5d_return, annualized volatility, momentum_score, volume_trend, RSI and
+    risk_adjusted_return, computed exactly as SectorRecommender did for one ticker at a time.
+    Tickers with fewer than min_periods prices are dropped.
+    Returns a DataFrame with one row per ticker.
+    """
+    p, counts = _compact(prices.to_numpy(dtype=np.float64))
+
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+        # Returns
+        first_close = p[0] if len(p) else np.full(p.shape[1], np.nan)
+        latest_close = _at(p, counts - 1)
+        cumulative_return = latest_close / first_close - 1
+        last_5d_return = latest_close / _at(p, counts - 5) - 1
+        returns = p[1:] / p[:-1] - 1
+
+        # Annualized volatility and momentum
+        volatility = np.nanstd(returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+        momentum_score = (2 * last_5d_return + cumulative_return) / 3
+
+        # Volume trend
+        if volumes is not None:
+            v, _ = _compact(volumes.reindex(columns=prices.columns).to_numpy(dtype=np.float64))
+            volume_trend = np.nanmean(v[1:] / v[:-1] - 1, axis=0)
+        else:
+            volume_trend = np.full(p.shape[1], np.nan)
+
+        # RSI over the last RSI_WINDOW price changes, from running sums of gains and losses
+        delta = np.diff(p, axis=0, prepend=np.nan)
+        gains = np.concatenate([np.zeros((1, p.shape[1])), np.cumsum(np.where(delta > 0, delta, 0), axis=0)])
+        losses = np.concatenate([np.zeros((1, p.shape[1])), np.cumsum(np.where(delta < 0, -delta, 0), axis=0)])
+        window_start = counts - RSI_WINDOW
+        columns = np.arange(p.shape[1])
+        valid = window_start >= 0
+        rs = np.where(
+            valid,
+            (gains[counts, columns] - gains[np.maximum(window_start, 0), columns]) /
+            (losses[counts, columns] - losses[np.maximum(window_start, 0), columns]),
+            np.nan
+        )
+        rsi = 100 - (100 / (1 + rs))
+
+        risk_adjusted_return = np.where(volatility != 0, cumulative_return / volatility, 0)
+
+    metrics = pd.DataFrame({
+        'return': cumulative_return,
+        'last_5d_return': last_5d_return,
+        'volatility': volatility,
+        'momentum_score': momentum_score,
+        'volume_trend': volume_trend,
+        'rsi': rsi,
+        'risk_adjusted_return': risk_adjusted_return
+    }, index=prices.columns)
+
+    return metrics[counts >= min_periods]
+
+
+def rolling_panel_metrics(prices, volumes, window=21):
+    """
+    panel_metrics over the trailing `window` bars ending at every date at once, for dense
+    (gap-free) dates x tickers panels. Returns a dict of metric name -> dates x tickers DataFrame;
+    dates with fewer than `window` bars of history are NaN. RSI matches panel_metrics when
+    window > RSI_WINDOW.
+    """
+    returns = prices.pct_change(fill_method=None)
+
+    cumulative_return = prices / prices.shift(window - 1) - 1
+    last_5d_return = prices / prices.shift(4) - 1
+    volatility = returns.rolling(window - 1).std() * np.sqrt(TRADING_DAYS)
+
+    delta = prices.diff()
+    gain = delta.where(delta > 0, 0).rolling(RSI_WINDOW).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(RSI_WINDOW).mean()
+    rsi = 100 - (100 / (1 + gain / loss))
+
+    risk_adjusted_return = (cumulative_return / volatility).where(volatility != 0, 0)
+
+    return {
+        'return': cumulative_return,
+        'last_5d_return': last_5d_return,
+        'volatility': volatility,
+        'momentum_score': (2 * last_5d_return + cumulative_return) / 3,
+        'volume_trend': volumes.pct_change(fill_method=None).rolling(window - 1).mean(),
+        'rsi': rsi.where(cumulative_return.notna()),
+        'risk_adjusted_return': risk_adjusted_return
+    }
+
+
+def composite_score(metrics, weights=None):
+    """
+    SectorRecommender's composite score from metric columns (or metric panels); RSI is scaled to 0-1
+    """
+    weights = COMPOSITE_WEIGHTS if weights is None else weights
+    score = 0
+    for name, weight in weights.items():
+        score = score + (metrics[name] / 100 if name == 'rsi' else metrics[name]) * weight
+    return score
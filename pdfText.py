@@ -0,0 +1,198 @@
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from PyPDF2 import PdfReader
+
+# Chunking of the QA scripts' CharacterTextSplitter(separator="\n", chunk_size=800, chunk_overlap=200)
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 200
+
+
+def file_hash(path, block_size=2**20):
+    """
+    SHA-256 hex digest of a file's contents, read a block at a time
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _extract_pages(path, pages):
+    """
+    Worker: text of the given pages of a PDF, '' for pages without text
+    """
+    reader = PdfReader(path)
+    return [reader.pages[page].extract_text() or '' for page in pages]
+
+
+class PageTextCache:
+    """
+    Extracted page text on disk, one file per (file hash, page) under cache_dir/<hash>/, plus the
+    page count of every file. Files are written atomically, so concurrent readers never see a
+    partial page.
+    """
+    def __init__(self, cache_dir='.pdf_cache'):
+        self.cache_dir = cache_dir
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def page_count(self, digest):
+        """
+        Number of pages of the file with this hash, None if it was never opened
+        """
+        try:
+            with open(os.path.join(self.cache_dir, digest, 'pages')) as f:
+                return int(f.read())
+        except FileNotFoundError:
+            return None
+
+    def set_page_count(self, digest, n_pages):
+        self._write(digest, 'pages', str(n_pages))
+
+    def get(self, digest, page):
+        """
+        Cached text of a page, None on a miss
+        """
+        try:
+            with open(self._path(digest, page), encoding='utf-8', newline='') as f:
+                text = f.read()
+        except FileNotFoundError:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return text
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(*key))
+
+    def put(self, digest, page, text):
+        self._write(digest, f'{page}.txt', text)
+
+    def _path(self, digest, page):
+        return os.path.join(self.cache_dir, digest, f'{page}.txt')
+
+    def _write(self, digest, name, text):
+        directory = os.path.join(self.cache_dir, digest)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        partial = f'{path}.{os.getpid()}.tmp'
+        with open(partial, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(partial, path)
+
+
+def _extract_serial(pdf_path, pages):
+    """
+    (page, text) of each page in order, parsed in this process
+    """
+    if not pages:
+        return
+    reader = PdfReader(pdf_path)
+    for page in pages:
+        yield page, reader.pages[page].extract_text() or ''
+
+
+def _extract_parallel(pdf_path, pages, processes, pages_per_task):
+    """
+    (page, text) of each page in order, parsed by a process pool with at most two tasks per
+    worker in flight, so memory stays bounded however far the consumer lags behind
+    """
+    tasks = (pages[start:start + pages_per_task] for start in range(0, len(pages), pages_per_task))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = deque((task, executor.submit(_extract_pages, pdf_path, task)) for task in islice(tasks, 2 * processes))
+        try:
+            while pending:
+                task, future = pending.popleft()
+                texts = future.result()
+                for next_task in islice(tasks, 1):
+                    pending.append((next_task, executor.submit(_extract_pages, pdf_path, next_task)))
+                yield from zip(task, texts)
+        finally:
+            # The consumer may stop early, e.g. once a question is answered
+            for _, future in pending:
+                future.cancel()
+
+
+def iter_pages(pdf_path, cache=None, processes=None, min_parallel_pages=32, pages_per_task=8):
+    """
+    Yield the text of every page of a PDF in order ('' for pages without text) without holding
+    the document in memory.
+    cache: optional PageTextCache; cached pages are read from disk instead of parsed, and parsed
+    pages are added to it, so a file is only ever parsed once
+    processes: with at least min_parallel_pages pages left to parse, extraction fans out to this
+    many worker processes (default: one per CPU), pages_per_task pages at a time
+    """
+    digest = file_hash(pdf_path) if cache is not None else None
+    n_pages = cache.page_count(digest) if cache is not None else None
+    if n_pages is None:
+        n_pages = len(PdfReader(pdf_path).pages)
+        if cache is not None:
+            cache.set_page_count(digest, n_pages)
+
+    missing = [page for page in range(n_pages) if cache is None or (digest, page) not in cache]
+    processes = processes or os.cpu_count()
+    if processes > 1 and len(missing) >= min_parallel_pages:
+        extracted = _extract_parallel(pdf_path, missing, processes, pages_per_task)
+    else:
+        extracted = _extract_serial(pdf_path, missing)
+
+    missing = set(missing)
+    try:
+        for page in range(n_pages):
+            if page in missing:
+                _, text = next(extracted)
+                if cache is not None:
+                    cache.put(digest, page, text)
+            else:
+                text = cache.get(digest, page)
+            yield text
+    finally:
+        extracted.close()
+
+
+def _iter_splits(pages, separator):
+    """
+    Non-empty pieces between separators of the concatenated page texts
+    """
+    carry = ''
+    for text in pages:
+        pieces = (carry + text).split(separator)
+        carry = pieces.pop()
+        for piece in pieces:
+            if piece:
+                yield piece
+    if carry:
+        yield carry
+
+
+def iter_chunks(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separator='\n'):
+    """
+    Yield the chunks CharacterTextSplitter(separator, chunk_size, chunk_overlap) makes of the
+    concatenated page texts, as the pages stream in
+    """
+    separator_len = len(separator)
+    current = deque()
+    total = 0
+    for piece in _iter_splits(pages, separator):
+        piece_len = len(piece)
+        if total + piece_len + (separator_len if current else 0) > chunk_size:
+            if current:
+                chunk = separator.join(current).strip()
+                if chunk:
+                    yield chunk
+                # Keep at most chunk_overlap characters of the previous chunk, and room for this piece
+                while total > chunk_overlap or (
+                    total + piece_len + (separator_len if current else 0) > chunk_size and total > 0
+                ):
+                    total -= len(current[0]) + (separator_len if len(current) > 1 else 0)
+                    current.popleft()
+        current.append(piece)
+        total += piece_len + (separator_len if len(current) > 1 else 0)
+
+    chunk = separator.join(current).strip()
+    if chunk:
+        yield chunk
@@ -1,37 +1,52 @@
-import os
-from PyPDF2 import PdfReader
-from langchain.text_splitter import CharacterTextSplitter
-from groq import Groq
-
-# Set up the API key
-os.environ["GROQ_API_KEY"] = ""
-
-# Initialize the Groq client
-client = Groq()
-
-# Read PDF
-pdf_path = "C:/Users/anupd/OneDrive/Desktop/Itinerary.pdf"
-pdf_reader = PdfReader(pdf_path)
-
-# Extract text from PDF
-raw_text = ''
-for page in pdf_reader.pages:
-    content = page.extract_text()
-    if content:
-        raw_text += content
-
-# Split text into chunks
-text_splitter = CharacterTextSplitter(
-    separator="\n",
-    chunk_size=800,
-    chunk_overlap=200,
-    length_function=len,
-)
-texts = text_splitter.split_text(raw_text)
-
-print(f"Number of text chunks: {len(texts)}")
-
-def ask_question(text, question):
+import asyncio
+import json
+import re
+from groq import AsyncGroq
+
+from chunkRetrieval import load_pdf_index
+from llmScheduler import LLMScheduler, estimate_tokens
+from responseCache import MISSING, LLMResponseCache
+from pdfText import PageTextCache, iter_chunks, iter_pages
+
+NOT_FOUND = "not in the given text"
+
+# Chunks a question is asked of when answering through the retrieval index
+TOP_K = 4
+
+# Greedy decoding: answers are extracted from the text, so the same request gets the same answer
+# and can be served from an LLMResponseCache
+COMPLETION_PARAMS = {
+    'model': "mixtral-8x7b-32768",
+    'temperature': 0,
+    'max_tokens': 200,
+    'top_p': 1,
+    'stream': False,
+}
+
+# Batched questions: the model's context window, and completion tokens allowed per question
+CONTEXT_WINDOW = 32768
+ANSWER_TOKENS = 200
+
+BATCH_COMPLETION_PARAMS = dict(COMPLETION_PARAMS, response_format={'type': 'json_object'})
+
+
+def read_chunks(pdf_path, cache_dir='.pdf_cache'):
+    """
+    Stream overlapping chunks of a PDF's text small enough for one prompt; pages are extracted
+    in parallel for large files and cached on disk per (file hash, page)
+    """
+    return iter_chunks(iter_pages(pdf_path, cache=PageTextCache(cache_dir)))
+
+
+def retrieve_chunks(pdf_path, question, k=TOP_K, cache_dir='.pdf_cache'):
+    """
+    The k chunks of a PDF most similar to the question, in document order; chunks are embedded
+    once per file and the index is kept with the cached page text
+    """
+    return load_pdf_index(pdf_path, cache_dir).top_chunks(question, k)
+
+
+def question_messages(text, question):
     prompt = f"""
     Answer the following question based ONLY on the information in the given text. 
     If the answer is not in the text, say "The answer is not in the given text."
@@ -43,37 +58,233 @@ def ask_question(text, question):
 
     Answer:
     """
-    
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a Q&A system. Only use the given text to answer questions.",
-            },
-            {
-                "role": "user",
-                "content": prompt,
-            }
-        ],
-        model="mixtral-8x7b-32768",
-        temperature=0.2,
-        max_tokens=200,
-        top_p=1,
-        stream=False,
-    )
-    
-    return chat_completion.choices[0].message.content
-
-# Example usage
-query = "What is the traveller's name? And From where is the traveller boarding and arriving?"
-answers = []
-
-for chunk in texts:
-    answer = ask_question(chunk, query)
-    if "not in the given text" not in answer.lower():
-        answers.append(answer)
-
-if answers:
-    print("Answer:", " ".join(answers))
-else:
-    print("Answer: The information is not found in the document.")
\ No newline at end of file
+
+    return [
+        {
+            "role": "system",
+            "content": "You are a Q&A system. Only use the given text to answer questions.",
+        },
+        {
+            "role": "user",
+            "content": prompt,
+        }
+    ]
+
+
+def ask_question(client, text, question, cache=None):
+    """
+    cache: optional responseCache.LLMResponseCache answering repeated questions without a request
+    """
+    messages = question_messages(text, question)
+    if cache is not None:
+        answer = cache.get(messages, COMPLETION_PARAMS)
+        if answer is not MISSING:
+            return answer
+
+    chat_completion = client.chat.completions.create(messages=messages, **COMPLETION_PARAMS)
+    answer = chat_completion.choices[0].message.content
+    if cache is not None:
+        cache.put(messages, COMPLETION_PARAMS, answer)
+    return answer
+
+
+def questions_messages(text, questions):
+    numbered = "\n".join(f"{number}. {question}" for number, question in enumerate(questions, start=1))
+    prompt = f"""
+    Answer each of the following questions based ONLY on the information in the given text.
+    Reply with a JSON object mapping each question's number to its answer, or to null if the
+    answer is not in the text.
+
+    Text:
+    {text}
+
+    Questions:
+    {numbered}
+
+    JSON answers:
+    """
+
+    return [
+        {
+            "role": "system",
+            "content": "You are a Q&A system. Only use the given text to answer questions. Reply in JSON.",
+        },
+        {
+            "role": "user",
+            "content": prompt,
+        }
+    ]
+
+
+def question_batches(text, questions, context_window=CONTEXT_WINDOW, answer_tokens=ANSWER_TOKENS):
+    """
+    Split questions into groups whose prompt about text, plus answer_tokens for each question,
+    fits the context window; a question that does not fit even alone gets a group of its own
+    """
+    budget = context_window - estimate_tokens(questions_messages(text, []))
+    batches = []
+    batch = []
+    used = 0
+    for question in questions:
+        # The question's numbered line in the prompt and room for its answer
+        cost = estimate_tokens([{'content': f"{len(batch) + 1}. {question}\n"}], answer_tokens)
+        if batch and used + cost > budget:
+            batches.append(batch)
+            batch = []
+            used = 0
+        batch.append(question)
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def parse_answers(content, questions):
+    """
+    {question: answer} of the questions a JSON answer map (keyed by question number) answers;
+    null, empty and "not in the given text" answers are left out, as is a reply that is not JSON
+    """
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    try:
+        answer_map = json.loads(match.group(0)) if match else {}
+    except ValueError:
+        return {}
+    if not isinstance(answer_map, dict):
+        return {}
+
+    answers = {}
+    for number, question in enumerate(questions, start=1):
+        answer = answer_map.get(str(number))
+        if answer is None or isinstance(answer, (dict, list)):
+            continue
+        answer = str(answer).strip()
+        if answer and NOT_FOUND not in answer.lower():
+            answers[question] = answer
+    return answers
+
+
+def ask_questions(client, text, questions, cache=None, context_window=CONTEXT_WINDOW, answer_tokens=ANSWER_TOKENS):
+    """
+    {question: answer} of the questions the text answers, asking as many questions per request
+    as fit the context window
+    """
+    answers = {}
+    for batch in question_batches(text, questions, context_window, answer_tokens):
+        messages = questions_messages(text, batch)
+        params = dict(BATCH_COMPLETION_PARAMS, max_tokens=answer_tokens * len(batch))
+        content = cache.get(messages, params) if cache is not None else MISSING
+        if content is MISSING:
+            chat_completion = client.chat.completions.create(messages=messages, **params)
+            content = chat_completion.choices[0].message.content
+            if cache is not None:
+                cache.put(messages, params, content)
+        answers.update(parse_answers(content, batch))
+    return answers
+
+
+def answer_questions(client, texts, questions, cache=None, context_window=CONTEXT_WINDOW, answer_tokens=ANSWER_TOKENS):
+    """
+    Ask all questions of the chunks (any iterable, e.g. read_chunks) together, each chunk in as
+    few requests as fit. A question is dropped from later requests once a chunk answers it, and
+    no more chunks are read once all are answered. Returns {question: answer, None if not found}.
+    """
+    answers = dict.fromkeys(questions)
+    for chunk in texts:
+        remaining = [question for question in questions if answers[question] is None]
+        if not remaining:
+            break
+        answers.update(ask_questions(client, chunk, remaining, cache, context_window, answer_tokens))
+    return answers
+
+
+def answer_question(client, texts, question, cache=None):
+    """
+    Ask the question of every chunk (any iterable, e.g. read_chunks) and keep the answers that were found
+    """
+    answers = []
+    for chunk in texts:
+        answer = ask_question(client, chunk, question, cache)
+        if NOT_FOUND not in answer.lower():
+            answers.append(answer)
+    return answers
+
+
+async def answer_question_async(scheduler, texts, question, max_answers=None, window=None, cache=None):
+    """
+    Ask the question of every chunk concurrently through an LLMScheduler and keep the answers
+    that were found, in chunk order. At most window chunks (default: twice the scheduler's
+    concurrency) are queued at once, so texts may be a long stream; once max_answers answers
+    are found, requests still outstanding are cancelled and no more chunks are read.
+    cache: optional responseCache.LLMResponseCache; cached chunks are answered without a request
+    """
+    window = window or 2 * scheduler.max_concurrency
+    chunks = enumerate(texts)
+    pending = set()
+    found = []
+
+    async def ask(position, chunk):
+        messages = question_messages(chunk, question)
+        if cache is not None:
+            answer = cache.get(messages, COMPLETION_PARAMS)
+            if answer is not MISSING:
+                return position, answer
+
+        chat_completion = await scheduler.complete(messages, **COMPLETION_PARAMS)
+        answer = chat_completion.choices[0].message.content
+        if cache is not None:
+            cache.put(messages, COMPLETION_PARAMS, answer)
+        return position, answer
+
+    try:
+        while True:
+            for position, chunk in chunks:
+                pending.add(asyncio.create_task(ask(position, chunk)))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                position, answer = task.result()
+                if NOT_FOUND not in answer.lower():
+                    found.append((position, answer))
+            if max_answers is not None and len(found) >= max_answers:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    return [answer for _, answer in sorted(found)]
+
+
+def answer_question_concurrent(texts, question, max_answers=None, client=None, cache=None, **scheduler_options):
+    """
+    Blocking answer_question_async on a new event loop with an AsyncGroq client (retries are
+    left to the scheduler); scheduler_options go to LLMScheduler. A client created here is
+    closed before returning, a client passed in is left to the caller.
+    """
+    async def run():
+        if client is not None:
+            return await answer_question_async(LLMScheduler(client, **scheduler_options), texts, question, max_answers, cache=cache)
+        async with AsyncGroq(max_retries=0) as async_client:
+            return await answer_question_async(LLMScheduler(async_client, **scheduler_options), texts, question, max_answers, cache=cache)
+    return asyncio.run(run())
+
+
+def main(pdf_path="C:/Users/anupd/OneDrive/Desktop/Itinerary.pdf"):
+    # Example usage
+    query = "What is the traveller's name? And From where is the traveller boarding and arriving?"
+    # Repeated questions about the same chunks are answered from .llm_cache.sqlite
+    cache = LLMResponseCache()
+    answers = answer_question_concurrent(retrieve_chunks(pdf_path, query), query, cache=cache)
+
+    if answers:
+        print("Answer:", " ".join(answers))
+    else:
+        print("Answer: The information is not found in the document.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,40 @@
 import os
-from PyPDF2 import PdfReader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-import requests
+import groq
+
+from chunkRetrieval import load_pdf_index
+from pdfText import PageTextCache, iter_chunks, iter_pages
 
 os.environ["GROQ_API_KEY"]=""
 
 groq_api_key = ""
 
-pdfReader = PdfReader("C:/Users/anupd/OneDrive/Desktop/Itinerary.pdf")
-
-
-raw_text = ''
-for i, page in enumerate(pdfReader.pages):
-    content = page.extract_text()
-    if content:
-        raw_text += content
-
-# print(raw_text)
-
-text_splitter = CharacterTextSplitter(
-    separator = "\n",
-    chunk_size = 800,
-    chunk_overlap  = 200,
-    length_function = len,
-)
-texts = text_splitter.split_text(raw_text)
-
-print(len(texts))
-import groq
 
-groq_client = groq.Client(api_key=groq_api_key)
-# embeddings = groq_client.embed_text(raw_text)
+def main(pdf_path="C:/Users/anupd/OneDrive/Desktop/Itinerary.pdf"):
+    # Pages are streamed (in parallel for large files) and cached on disk per (file hash, page)
+    raw_text = ''.join(iter_pages(pdf_path, cache=PageTextCache()))
 
-query = "What is the travel time?"
-response = groq_client.query_document(text=raw_text, query=query)
-print("Answer:", response)
+    # print(raw_text)
 
-# def create_embeddings(text):
-#     response = requests.post(
-#         groq_embeddings_url,
-#         headers={"Authorization": f"Bearer {groq_api_key}"},
-#         json={"text": text}
-#     )
-#     return response.json()["embeddings"]
+    # Same chunks as CharacterTextSplitter(separator="\n", chunk_size=800, chunk_overlap=200)
+    texts = list(iter_chunks([raw_text]))
 
-# # Create embeddings for each chunk
-# embeddings = create_embeddings(texts)
-# import numpy as np
+    print(len(texts))
 
-# # Convert embeddings into a numpy array
-# embeddings_matrix = np.array(embeddings)
+    query = "What is the travel time?"
 
+    # Embed the chunks once (kept with the cached page text) and search them for the query
+    document_search = load_pdf_index(pdf_path)
+    similar_docs = document_search.search(query, k=4)
 
-# document_search = FAISS.from_embeddings(texts, embeddings)
+    # Print the most relevant document chunks
+    for doc, similarity in similar_docs:
+        print(doc)
 
+    groq_client = groq.Client(api_key=groq_api_key)
+    # embeddings = groq_client.embed_text(raw_text)
 
-# query = "What is the travel time?"
-# similar_docs = document_search.similarity_search(query)
+    response = groq_client.query_document(text=raw_text, query=query)
+    print("Answer:", response)
 
-# # Print the most relevant document chunks
-# for doc in similar_docs:
-#     print(doc['text'])
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# get() returns the same miss sentinel as resultCache.ResultCache
+from resultCache import MISSING
+
+
+def request_key(messages, params):
+    """
+    Content address of a chat completion request: SHA-256 of its messages and generation
+    parameters (model, temperature, max_tokens, ...) in a canonical JSON form
+    """
+    payload = json.dumps({'messages': messages, 'params': params}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def is_deterministic(params):
+    """
+    Whether the same request always gets the same completion, i.e. it is sampled greedily
+    (the API's default temperature is 1)
+    """
+    return params.get('temperature', 1) == 0
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of chat completion texts in a SQLite file, keyed by request_key, so a
+    repeated (prompt, model, parameters) request is answered locally across runs and processes.
+    Entries older than ttl seconds are treated as misses, and least recently used entries are
+    evicted to stay within max_bytes of response text and max_entries. Sampled requests
+    (temperature above 0) bypass the cache unless cache_sampled is set, since their answers
+    are meant to vary. stats counts hits, misses, bypasses, evictions and expirations.
+    """
+    def __init__(self, path='.llm_cache.sqlite', max_bytes=256 * 2**20, ttl=None, max_entries=None,
+                 cache_sampled=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_sampled = cache_sampled
+        self.stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'evictions': 0, 'expirations': 0}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL with synchronous=NORMAL commits without an fsync, so recording a hit stays cheap
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, '
+            'created REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def cacheable(self, params):
+        return self.cache_sampled or is_deterministic(params)
+
+    def get(self, messages, params, default=MISSING):
+        """
+        Cached completion text of the request, or default on a miss, expired entry or bypass
+        """
+        if not self.cacheable(params):
+            self.stats['bypassed'] += 1
+            return default
+
+        key = request_key(messages, params)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT response, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.stats['expirations'] += 1
+                row = None
+
+            if row is None:
+                self.stats['misses'] += 1
+                return default
+
+            self._db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+            self.stats['hits'] += 1
+            return row[0]
+
+    def put(self, messages, params, response):
+        """
+        Store the completion text of the request, evicting least recently used entries to stay
+        within budget
+        """
+        if not self.cacheable(params):
+            return
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+
+        key = request_key(messages, params)
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO responses (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)',
+                    (key, response, size, now, now)
+                )
+                self._evict()
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def _evict(self):
+        entries, nbytes = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        if nbytes <= self.max_bytes and (self.max_entries is None or entries <= self.max_entries):
+            return
+
+        evicted = []
+        for key, size in self._db.execute('SELECT key, size FROM responses ORDER BY accessed'):
+            if nbytes <= self.max_bytes and (self.max_entries is None or entries <= self.max_entries):
+                break
+            evicted.append((key,))
+            entries -= 1
+            nbytes -= size
+        self._db.executemany('DELETE FROM responses WHERE key = ?', evicted)
+        self.stats['evictions'] += len(evicted)
+
+    def clear(self):
+        """
+        Drop every entry, keeping the statistics
+        """
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,94 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by get() on a miss when no default is given, so cached empty results still count as hits
+MISSING = object()
+
+
+def _estimate_size(value):
+    """
+    Approximate memory footprint of a cached key or result (containers, strings and numbers)
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_estimate_size(item) for item in value)
+    return size
+
+
+class ResultCache:
+    """
+    In-memory LRU cache for query results, e.g. FinancialRecommender(result_cache=ResultCache()).
+    Entries older than ttl seconds are treated as misses, and least recently used entries are
+    evicted to stay within max_bytes (estimated) and max_entries. stats counts hits, misses,
+    evictions and expirations.
+    """
+    def __init__(self, max_bytes=64 * 2**20, ttl=None, max_entries=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def get(self, key, default=MISSING):
+        """
+        Cached value for key, or default on a miss or expired entry
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[2] > self.ttl:
+                del self.entries[key]
+                self.nbytes -= entry[1]
+                self.stats['expirations'] += 1
+                entry = None
+
+            if entry is None:
+                self.stats['misses'] += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """
+        Store value for key, evicting least recently used entries to stay within budget
+        """
+        size = _estimate_size(key) + _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            self.entries[key] = (value, size, time.monotonic())
+            self.nbytes += size
+
+            while self.nbytes > self.max_bytes or (
+                self.max_entries is not None and len(self.entries) > self.max_entries
+            ):
+                _, (_, evicted_size, _) = self.entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        """
+        Drop every entry, keeping the statistics
+        """
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
@@ -0,0 +1,219 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from panelMetrics import COMPOSITE_WEIGHTS, TRADING_DAYS, build_panel, rolling_panel_metrics
+
+SUMMARY_COLUMNS = ['mean_return', 'mean_benchmark', 'mean_excess', 'hit_rate', 'information_ratio']
+
+# Per-process copy of the rebalance-date metrics for weight sweeps, set by _init_sweep
+_sweep_state = {}
+
+
+def weight_grid(step=0.1, names=None):
+    """
+    Every combination of composite-score weights on a `step` grid that sums to 1,
+    as a list of metric name -> weight dicts
+    """
+    names = list(COMPOSITE_WEIGHTS) if names is None else list(names)
+    steps = int(round(1 / step))
+    grid = []
+    for counts in itertools.product(range(steps + 1), repeat=len(names) - 1):
+        if sum(counts) <= steps:
+            weights = list(counts) + [steps - sum(counts)]
+            grid.append({name: count / steps for name, count in zip(names, weights)})
+    return grid
+
+
+def _top_sectors(scores, top_n):
+    """
+    Positions of the top_n highest scores along the last axis, best first, and whether each
+    position holds a score; sectors without a score (NaN) are only padding and never selected
+    """
+    ranked = np.where(np.isnan(scores), -np.inf, scores)
+    top = np.argpartition(-ranked, top_n - 1, axis=-1)[..., :top_n]
+    top_scores = np.take_along_axis(ranked, top, axis=-1)
+    order = np.argsort(-top_scores, axis=-1, kind='stable')
+    return np.take_along_axis(top, order, axis=-1), np.take_along_axis(top_scores, order, axis=-1) > -np.inf
+
+
+def _selection_returns(weights, features, forward_returns, top_n):
+    """
+    Mean forward return of the top_n scored sectors at every rebalance date, for each weight vector.
+    weights: (combinations, metrics), features: (metrics, dates, sectors), forward_returns: (dates, sectors)
+    Returns a (combinations, dates) array.
+    """
+    scores = np.einsum('gk,kds->gds', weights, features)
+    top, valid = _top_sectors(scores, top_n)
+    selected = np.take_along_axis(
+        np.broadcast_to(forward_returns, scores.shape), top, axis=2
+    )
+    selected = np.where(valid, selected, np.nan)
+    with np.errstate(invalid='ignore'):
+        return np.nanmean(selected, axis=2)
+
+
+def _summarize(portfolio_returns, benchmark_returns, horizon):
+    """
+    Summary statistics per row of a (combinations, dates) array of portfolio returns
+    """
+    excess = portfolio_returns - benchmark_returns
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.nanstd(excess, axis=1, ddof=1)
+        return np.column_stack([
+            np.nanmean(portfolio_returns, axis=1),
+            np.repeat(np.nanmean(benchmark_returns), len(portfolio_returns)),
+            np.nanmean(excess, axis=1),
+            (excess > 0).sum(axis=1) / (~np.isnan(excess)).sum(axis=1),
+            np.nanmean(excess, axis=1) / std * np.sqrt(TRADING_DAYS / horizon)
+        ])
+
+
+def _init_sweep(features, forward_returns, benchmark_returns, top_n, horizon):
+    _sweep_state.update(
+        features=features, forward_returns=forward_returns, benchmark_returns=benchmark_returns,
+        top_n=top_n, horizon=horizon
+    )
+
+
+def _sweep_chunk(weights):
+    state = _sweep_state
+    portfolio_returns = _selection_returns(weights, state['features'], state['forward_returns'], state['top_n'])
+    return _summarize(portfolio_returns, state['benchmark_returns'], state['horizon'])
+
+
+class SectorBacktest:
+    """
+    Replays SectorRecommender's sector selection over a long price history.
+
+    Metrics are computed for every date at once with rolling windows of `window` bars (the
+    period calculate_sector_metrics would see), the composite score and top_n selection are
+    evaluated every `rebalance` bars and scored by the equal-weighted forward return over the
+    next `horizon` bars, against the equal-weighted return of all sectors. Weight grids are
+    swept with one vectorized product per chunk of combinations, optionally on a process pool.
+    """
+    def __init__(self, prices, volumes, window=21, horizon=21, rebalance=21, top_n=3):
+        if window <= 5:
+            raise ValueError("window must be longer than the 5-day return")
+
+        self.prices = prices
+        self.volumes = volumes.reindex(index=prices.index, columns=prices.columns)
+        self.window = window
+        self.horizon = horizon
+        self.rebalance = rebalance
+        self.top_n = min(top_n, prices.shape[1])
+
+        self.metrics = rolling_panel_metrics(self.prices, self.volumes, window)
+        self.forward_returns = self.prices.shift(-horizon) / self.prices - 1
+
+        # Rebalance once a full window exists, up to the last date with a complete forward return
+        self.rebalance_dates = self.prices.index[window - 1:len(self.prices) - horizon:rebalance]
+
+    @classmethod
+    def from_frames(cls, frames, **kwargs):
+        """
+        Build from a dict of sector -> OHLCV DataFrame, e.g. SectorRecommender.fetch_sector_data('10y')
+        """
+        frames = {sector: frame for sector, frame in frames.items() if not frame.empty}
+        return cls(build_panel(frames, 'Adj Close'), build_panel(frames, 'Volume'), **kwargs)
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        """
+        Build from a marketDataStore.MarketDataStore with one instrument per sector
+        """
+        return cls(store.price_frame().astype(np.float64), store.volume_frame().astype(np.float64), **kwargs)
+
+    def scores(self, weights=None):
+        """
+        Composite score of every sector at every rebalance date
+        """
+        weights = COMPOSITE_WEIGHTS if weights is None else weights
+        features = self._features(list(weights))
+        scores = np.einsum('k,kds->ds', np.array(list(weights.values())), features)
+        return pd.DataFrame(scores, index=self.rebalance_dates, columns=self.prices.columns)
+
+    def run(self, weights=None):
+        """
+        Selection and forward returns at every rebalance date for one set of weights.
+        Returns a DataFrame with the selected sectors, portfolio, benchmark and excess return per date.
+        """
+        weights = COMPOSITE_WEIGHTS if weights is None else weights
+        features = self._features(list(weights))
+        forward_returns = self.forward_returns.loc[self.rebalance_dates].to_numpy(dtype=np.float64)
+        # The same selection as sweep, so run(weights) always agrees with its sweep row
+        portfolio = _selection_returns(np.array([list(weights.values())]), features, forward_returns, self.top_n)[0]
+        top, valid = _top_sectors(self.scores(weights).to_numpy(), self.top_n)
+        with np.errstate(invalid='ignore'):
+            benchmark = np.nanmean(forward_returns, axis=1)
+
+        return pd.DataFrame({
+            'selected': [list(self.prices.columns[positions[keep]]) for positions, keep in zip(top, valid)],
+            'portfolio_return': portfolio,
+            'benchmark_return': benchmark,
+            'excess_return': portfolio - benchmark
+        }, index=pd.Index(self.rebalance_dates, name='date'))
+
+    def summary(self, weights=None):
+        """
+        Summary statistics (mean portfolio/benchmark/excess forward return, hit rate,
+        annualized information ratio) for one set of weights
+        """
+        return self.sweep([COMPOSITE_WEIGHTS if weights is None else weights], processes=1).iloc[0]
+
+    def sweep(self, weight_grid, processes=1, chunk_size=256):
+        """
+        Summary statistics for every weights dict in weight_grid (e.g. from weight_grid()),
+        best information ratio first. processes > 1 spreads chunks of combinations over a process pool.
+        """
+        names = list(weight_grid[0])
+        weights = np.array([[combination.get(name, 0) for name in names] for combination in weight_grid])
+        features = self._features(names)
+        forward_returns = self.forward_returns.loc[self.rebalance_dates].to_numpy(dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            benchmark_returns = np.nanmean(forward_returns, axis=1)
+        args = (features, forward_returns, benchmark_returns, self.top_n, self.horizon)
+
+        chunks = [weights[i:i + chunk_size] for i in range(0, len(weights), chunk_size)]
+        processes = processes or os.cpu_count()
+        if processes == 1 or len(chunks) == 1:
+            _init_sweep(*args)
+            results = [_sweep_chunk(chunk) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_sweep, initargs=args) as executor:
+                results = list(executor.map(_sweep_chunk, chunks))
+
+        summary = pd.DataFrame(np.vstack(results), columns=SUMMARY_COLUMNS)
+        summary = pd.concat([pd.DataFrame(weights, columns=names), summary], axis=1)
+        return summary.sort_values('information_ratio', ascending=False, kind='stable')
+
+    def _features(self, names):
+        """
+        (metrics, rebalance dates, sectors) array of the score inputs, RSI scaled to 0-1
+        """
+        return np.stack([
+            self.metrics[name].loc[self.rebalance_dates].to_numpy(dtype=np.float64) / (100 if name == 'rsi' else 1)
+            for name in names
+        ])
+
+
+def main(data_source=None, period='10y', step=0.1, processes=None):
+    from yfinanaceLibrary import SectorRecommender
+
+    recommender = SectorRecommender(data_source)
+    backtest = SectorBacktest.from_frames(recommender.fetch_sector_data(period=period))
+
+    print(f"\n{len(backtest.rebalance_dates)} rebalance dates, {backtest.prices.shape[1]} sectors")
+    print("\nDefault composite weights:")
+    print(backtest.summary().to_string())
+
+    grid = weight_grid(step)
+    print(f"\nBest of {len(grid)} weight combinations:")
+    print(backtest.sweep(grid, processes=processes).head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,64 @@
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from collections import defaultdict
-from datetime import datetime, timedelta
 
-class FinancialRecommender:
-    def __init__(self):
-        self.user_holdings = {}
-        self.instrument_features = {}
-        self.similarity_matrix = None
+import financialRecommendation
+from marketDataStore import MarketDataStore
+
+class FinancialRecommender(financialRecommendation.FinancialRecommender):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         self.sector_performance = {}
         self.sector_momentum = {}
         
+        # sector -> instrument ids, presorted by sector momentum; rebuilt whenever features change
+        self.sector_instruments = {}
+        
+    @classmethod
+    def load(cls, path, mmap=True, **options):
+        recommender = super().load(path, mmap=mmap, **options)
+        recommender._index_sectors()
+        return recommender
+    
+    def add_instrument_features(self, instrument_data):
+        super().add_instrument_features(instrument_data)
+        self._index_sectors()
+    
+    def upsert_instruments(self, instrument_data):
+        super().upsert_instruments(instrument_data)
+        self._index_sectors()
+    
+    def remove_instruments(self, instrument_ids):
+        super().remove_instruments(instrument_ids)
+        self._index_sectors()
+    
+    def _index_sectors(self):
+        """
+        Rebuild the sector -> instrument ids index, each sector's instruments ordered by
+        descending sector momentum (ties keep instrument order)
+        """
+        self.sector_instruments = {}
+        if not self.instrument_ids:
+            return
+            
+        momentum = np.zeros(len(self.instrument_ids))
+        if 'sector_momentum' in self.numerical_columns:
+            momentum = np.asarray(self.raw_numerical)[:, self.numerical_columns.index('sector_momentum')]
+        
+        # One sort by (sector, -momentum, row), then each sector is a contiguous run
+        sector_codes = np.asarray(self.sector_codes)
+        order = np.lexsort((-momentum, sector_codes))
+        sorted_codes = sector_codes[order]
+        starts = np.flatnonzero(np.diff(sorted_codes, prepend=-2))
+        for start, end in zip(starts, np.append(starts[1:], len(order))):
+            if sorted_codes[start] >= 0:
+                self.sector_instruments[self.sector_columns[sorted_codes[start]]] = [
+                    self.instrument_ids[row] for row in order[start:end]
+                ]
+        
     def add_market_data(self, market_data):
         """
         Add historical market data for sector analysis
-        market_data: DataFrame with columns:
+        market_data: marketDataStore.MarketDataStore, or a DataFrame with columns:
         - date
         - instrument_id
         - sector
@@ -29,14 +72,35 @@ class FinancialRecommender:
         """
         Calculate various sector performance metrics
         """
-        # Convert date to datetime if it's not already
-        market_data['date'] = pd.to_datetime(market_data['date'])
+        if isinstance(market_data, MarketDataStore):
+            # Already columnar and ordered by instrument and date
+            dates, instrument_codes, sector_codes, prices, volumes = market_data.long_arrays()
+            dates = dates.view('datetime64[ns]')
+            prices, volumes = prices.astype(np.float64), volumes.astype(np.float64)
+            sectors = market_data.sectors
+        else:
+            # Read-only views of the input; nothing is added to or changed in market_data
+            dates = pd.to_datetime(market_data['date']).to_numpy(dtype='datetime64[ns]')
+            instrument_codes = pd.factorize(market_data['instrument_id'])[0]
+            sector_codes, sectors = pd.factorize(market_data['sector'], sort=True)
+            
+            # Sort once by instrument and date, then daily returns and volume changes are shifts
+            order = np.lexsort((dates, instrument_codes))
+            dates, instrument_codes, sector_codes = dates[order], instrument_codes[order], sector_codes[order]
+            prices = market_data['price'].to_numpy(dtype=np.float64)[order]
+            volumes = market_data['volume'].to_numpy(dtype=np.float64)[order]
         
-        # Calculate daily returns
-        market_data['daily_return'] = market_data.groupby('instrument_id')['price'].pct_change()
+        same_instrument = np.zeros(len(dates), dtype=bool)
+        same_instrument[1:] = instrument_codes[1:] == instrument_codes[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            daily_return = np.full(len(dates), np.nan)
+            daily_return[1:] = np.where(same_instrument[1:], prices[1:] / prices[:-1] - 1, np.nan)
+            volume_change = np.full(len(dates), np.nan)
+            volume_change[1:] = np.where(same_instrument[1:], volumes[1:] / volumes[:-1] - 1, np.nan)
+            log_return = np.log1p(daily_return)
         
         # Get the latest date in the data
-        latest_date = market_data['date'].max()
+        latest_date = dates.max() if len(dates) else np.datetime64('NaT')
         
         # Time windows for analysis (in days)
         windows = {
@@ -48,17 +112,32 @@ class FinancialRecommender:
         # Calculate sector performance for different time windows
         self.sector_performance = {}
         self.sector_momentum = {}
+        n_sectors = len(sectors)
+        known_sector = sector_codes >= 0
+        has_return = known_sector & ~np.isnan(daily_return)
+        has_volume_change = known_sector & ~np.isnan(volume_change)
         
         for window_name, days in windows.items():
-            start_date = latest_date - timedelta(days=days)
-            window_data = market_data[market_data['date'] >= start_date]
+            in_window = dates >= latest_date - np.timedelta64(days, 'D')
+            present = np.bincount(sector_codes[in_window & known_sector], minlength=n_sectors) > 0
             
-            # Calculate sector returns
-            sector_returns = window_data.groupby('sector')['daily_return'].agg([
-                ('return', lambda x: (1 + x).prod() - 1),
-                ('volatility', 'std'),
-                ('volume_change', lambda x: window_data.groupby('sector')['volume'].pct_change().mean())
-            ])
+            # Per-sector sums over the window: compounded return from summed log returns,
+            # sample volatility around the sector mean, and mean volume change
+            returns = in_window & has_return
+            codes = sector_codes[returns]
+            count = np.bincount(codes, minlength=n_sectors)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = np.bincount(codes, weights=daily_return[returns], minlength=n_sectors) / count
+                squares = np.bincount(codes, weights=(daily_return[returns] - mean[codes]) ** 2, minlength=n_sectors)
+                changes = in_window & has_volume_change
+                sector_returns = pd.DataFrame({
+                    'return': np.expm1(np.bincount(codes, weights=log_return[returns], minlength=n_sectors)),
+                    'volatility': np.where(count > 1, np.sqrt(squares / (count - 1)), np.nan),
+                    'volume_change': (
+                        np.bincount(sector_codes[changes], weights=volume_change[changes], minlength=n_sectors) /
+                        np.bincount(sector_codes[changes], minlength=n_sectors)
+                    )
+                }, index=pd.Index(sectors, name='sector'))[present]
             
             # Calculate momentum score
             sector_returns['momentum_score'] = (
@@ -94,44 +173,20 @@ class FinancialRecommender:
             for sector in top_sectors
         }
     
-    def add_instrument_features(self, instrument_data):
+    def _numerical_features(self, instrument_data):
         """
         Enhanced version that includes sector momentum in features
         """
-        # Convert categorical variables to dummy variables
-        sector_dummies = pd.get_dummies(instrument_data['sector'])
-        
-        # Normalize numerical features
-        numerical_features = ['market_cap', 'pe_ratio', 'dividend_yield', 'volatility', 'beta']
-        normalized_features = instrument_data[numerical_features].apply(
-            lambda x: (x - x.min()) / (x.max() - x.min())
-        )
+        numerical_features = super()._numerical_features(instrument_data)
         
         # Add sector momentum scores if available
         if self.sector_momentum:
             # Use monthly momentum by default
-            sector_scores = pd.Series(
-                index=instrument_data['sector'],
-                data=instrument_data['sector'].map(
-                    lambda x: self.sector_performance['month'].loc[x, 'momentum_score']
-                )
+            numerical_features['sector_momentum'] = instrument_data['sector'].map(
+                self.sector_performance['month']['momentum_score']
             )
-            normalized_features['sector_momentum'] = (
-                sector_scores - sector_scores.min()
-            ) / (sector_scores.max() - sector_scores.min())
-        
-        # Combine features
-        features = pd.concat([normalized_features, sector_dummies], axis=1)
-        
-        # Create dictionary with instrument_id as key and features as value
-        self.instrument_features = {
-            instrument_id: features.loc[idx].values 
-            for idx, instrument_id in enumerate(instrument_data['instrument_id'])
-        }
         
-        # Calculate similarity matrix
-        feature_matrix = np.array([features for features in self.instrument_features.values()])
-        self.similarity_matrix = cosine_similarity(feature_matrix)
+        return numerical_features
     
     def get_sector_based_recommendations(self, n_recommendations=5, timeframe='month'):
         """
@@ -139,24 +194,13 @@ class FinancialRecommender:
         """
         trending_sectors = self.get_trending_sectors(timeframe=timeframe)
         recommendations = []
+        if not trending_sectors:
+            return recommendations
         
-        # Get instrument features DataFrame
-        feature_df = pd.DataFrame(self.instrument_features).T
-        
+        per_sector = max(1, n_recommendations // len(trending_sectors))
         for sector in trending_sectors:
-            # Filter instruments in the trending sector
-            sector_instruments = feature_df[feature_df[sector] == 1]
-            
-            # Sort by sector momentum if available
-            if 'sector_momentum' in feature_df.columns:
-                sector_instruments = sector_instruments.sort_values('sector_momentum', ascending=False)
-            
-            # Get top instruments from sector
-            top_sector_instruments = sector_instruments.head(
-                max(1, n_recommendations // len(trending_sectors))
-            )
-            
-            for instrument_id in top_sector_instruments.index:
+            # Top instruments from the sector, already sorted by sector momentum
+            for instrument_id in self.sector_instruments.get(sector, [])[:per_sector]:
                 recommendations.append({
                     'instrument_id': instrument_id,
                     'sector': sector,
@@ -172,22 +216,17 @@ def demo_recommender_with_trends():
     instruments = ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'FB', 'NFLX', 'TSLA']
     sectors = ['Technology', 'Technology', 'Technology', 'Consumer', 'Technology', 'Technology', 'Automotive']
     
-    # Generate sample market data
-    market_data = []
-    for instrument, sector in zip(instruments, sectors):
+    # Generate sample market data straight into a columnar store
+    prices = np.empty((len(dates), len(instruments)), dtype=np.float32)
+    volumes = np.empty_like(prices)
+    for column in range(len(instruments)):
         base_price = np.random.uniform(100, 1000)
-        for date in dates:
-            price = base_price * (1 + np.random.normal(0, 0.02))
-            volume = np.random.uniform(1000000, 5000000)
-            market_data.append({
-                'date': date,
-                'instrument_id': instrument,
-                'sector': sector,
-                'price': price,
-                'volume': volume
-            })
+        for row in range(len(dates)):
+            prices[row, column] = base_price * (1 + np.random.normal(0, 0.02))
+            volumes[row, column] = np.random.uniform(1000000, 5000000)
     
-    market_data = pd.DataFrame(market_data)
+    sector_codes, sector_names = pd.factorize(pd.Series(sectors), sort=True)
+    market_data = MarketDataStore(dates.as_unit('ns').asi8, instruments, prices, volumes, sector_names, sector_codes)
     
     # Create sample instrument data
     instrument_data = pd.DataFrame({
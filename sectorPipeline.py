@@ -0,0 +1,144 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from panelMetrics import build_panel, panel_metrics
+
+
+def _shared_panel_metrics(name, shape, columns, min_periods):
+    """
+    Worker: panel metrics of a (2, dates, tickers) price/volume block in shared memory
+    """
+    # Pool workers share the parent's resource tracker, which unlinks the block once the parent is done
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        panel = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        metrics = panel_metrics(
+            pd.DataFrame(panel[0], columns=columns, copy=False),
+            pd.DataFrame(panel[1], columns=columns, copy=False),
+            min_periods=min_periods
+        )
+        del panel
+        return metrics
+    finally:
+        block.close()
+
+
+class SectorPipeline:
+    """
+    Runs SectorRecommender's fetch -> metrics -> top sectors -> recommendations stages with the
+    metric work fanned out to a process pool.
+
+    Sector ETFs and every sector's components are fetched through the recommender's batched
+    fetcher; as batches arrive they are grouped into chunks of chunk_size tickers, copied once
+    into a shared memory block and scored by a worker, so fetching and computation overlap and
+    no DataFrame is pickled. Worker results are merged into get_top_sectors' composite-score table
+    and rank_sector_stocks' recommendations.
+
+    chunk_size defaults to an even split of the components over the workers, capped at the
+    fetcher's batch size so the first chunks are scored while later batches still download.
+    """
+    def __init__(self, recommender, processes=None, chunk_size=None, mp_context=None):
+        self.recommender = recommender
+        self.processes = processes or os.cpu_count()
+        self.chunk_size = chunk_size
+        # Fetch threads are running while work is submitted, so workers are not forked by default
+        self.mp_context = mp_context or multiprocessing.get_context('spawn')
+
+    def run(self, period='1mo', interval='1d', top_n=3, num_stocks_per_sector=3):
+        """
+        Returns (top_sectors, recommendations) as get_top_sectors and get_sector_recommendations do
+        """
+        recommender = self.recommender
+        etf_sectors = {etf: sector for sector, etf in recommender.sector_etfs.items()}
+        components = [stock for stocks in recommender.sector_components.values() for stock in stocks]
+        chunk_size = self.chunk_size or max(1, min(
+            recommender.fetcher.batch_size, math.ceil(len(components) / self.processes)
+        ))
+
+        etf_metrics, stock_metrics, pending = [], [], []
+        with ProcessPoolExecutor(max_workers=self.processes, mp_context=self.mp_context) as executor:
+            try:
+                chunks = {True: {}, False: {}}
+                for data, errors in recommender.fetcher.iter_fetch(
+                    list(etf_sectors) + components, period=period, interval=interval
+                ):
+                    for ticker, error in errors.items():
+                        print(f"Error fetching data for {etf_sectors.get(ticker, ticker)} ({ticker}): {str(error)}")
+
+                    for ticker, frame in data.items():
+                        if frame.empty:
+                            continue
+                        is_etf = ticker in etf_sectors
+                        chunk = chunks[is_etf]
+                        chunk[etf_sectors[ticker] if is_etf else ticker] = frame
+                        if len(chunk) >= chunk_size:
+                            pending.append(self._submit(executor, chunk, is_etf))
+                            chunks[is_etf] = {}
+
+                for is_etf, chunk in chunks.items():
+                    if chunk:
+                        pending.append(self._submit(executor, chunk, is_etf))
+
+                for future, block, is_etf in pending:
+                    (etf_metrics if is_etf else stock_metrics).append(future.result())
+            finally:
+                for future, block, is_etf in pending:
+                    future.cancel()
+                    block.close()
+                    block.unlink()
+
+        metrics = pd.concat(etf_metrics).to_dict(orient='index') if etf_metrics else {}
+        top_sectors = recommender.get_top_sectors(metrics, top_n=top_n)
+        stock_metrics = pd.concat(stock_metrics) if stock_metrics else panel_metrics(pd.DataFrame())
+        recommendations = recommender.rank_sector_stocks(top_sectors, stock_metrics, num_stocks_per_sector)
+        return top_sectors, recommendations
+
+    def _submit(self, executor, frames, is_etf):
+        prices, volumes = build_panel(frames, 'Adj Close'), build_panel(frames, 'Volume')
+
+        shape = (2,) + prices.shape
+        block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+        panel = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        panel[0] = prices.to_numpy(dtype=np.float64)
+        panel[1] = volumes.reindex(index=prices.index, columns=prices.columns).to_numpy(dtype=np.float64)
+        del panel
+
+        # Sector ETFs need a 5-day return, components only need one bar as in get_sector_recommendations
+        future = executor.submit(
+            _shared_panel_metrics, block.name, shape, list(prices.columns), 5 if is_etf else 1
+        )
+        return future, block, is_etf
+
+
+def main(data_source=None, processes=None):
+    from yfinanaceLibrary import SectorRecommender
+
+    recommender = SectorRecommender(data_source)
+    top_sectors, recommendations = SectorPipeline(recommender, processes=processes).run()
+
+    print("\nTop Performing Sectors:")
+    print("----------------------")
+    for sector in top_sectors.index:
+        print(f"\n{sector}:")
+        print(f"Composite Score: {top_sectors.loc[sector, 'composite_score']:.4f}")
+        print(f"Return: {top_sectors.loc[sector, 'return']:.2%}")
+        print(f"RSI: {top_sectors.loc[sector, 'rsi']:.2f}")
+        print(f"Risk-Adjusted Return: {top_sectors.loc[sector, 'risk_adjusted_return']:.4f}")
+
+    print("\nStock Recommendations:")
+    print("---------------------")
+    for rec in recommendations:
+        print(f"\nStock: {rec['stock']}")
+        print(f"Sector: {rec['sector']}")
+        print(f"1-Month Return: {rec['return']:.2%}")
+        print(f"Risk-Adjusted Return: {rec['risk_adjusted_return']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+import time
+
+# Prefix of the per-save subdirectories of a snapshot directory
+GENERATION_PREFIX = 'gen-'
+
+
+def new_generation(path):
+    """
+    Fresh subdirectory of snapshot directory path for the files of one save
+    """
+    os.makedirs(path, exist_ok=True)
+    generation = f'{GENERATION_PREFIX}{time.time_ns()}-{os.getpid()}'
+    os.makedirs(os.path.join(path, generation))
+    return generation
+
+
+def publish(path, generation, manifest):
+    """
+    Make a save current: manifest.json, pointing at generation, replaces the previous one in a
+    single rename, then earlier generations are removed. Files are never rewritten in place, so
+    processes that memory-mapped an earlier generation keep their data.
+    """
+    manifest = dict(manifest, generation=generation)
+    manifest_path = os.path.join(path, 'manifest.json')
+    partial = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(partial, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(partial, manifest_path)
+    remove_generations(path, keep=generation)
+
+
+def remove_generations(path, keep):
+    """
+    Delete every generation of directory path but keep; unlinking leaves memory-mapped files
+    readable for the processes that mapped them
+    """
+    for name in os.listdir(path):
+        if name.startswith(GENERATION_PREFIX) and name != keep:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+
+def load(path, read, attempts=3):
+    """
+    read(manifest, directory) of the current save in snapshot directory path, where directory
+    holds its files. A save that replaces the snapshot while it is being read removes the files
+    of the one read, so the read is retried on the new manifest.
+    """
+    for attempt in range(attempts):
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        # Snapshots written before generations kept their files next to the manifest
+        directory = os.path.join(path, manifest.get('generation', ''))
+        try:
+            return read(manifest, directory)
+        except FileNotFoundError:
+            if attempt == attempts - 1:
+                raise
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+from panelMetrics import RSI_WINDOW, TRADING_DAYS
+
+
+class StreamingMetrics:
+    """
+    Incremental sector metrics over a trailing window of bars, for many tickers at once.
+
+    Each ticker keeps O(1) rolling state: ring buffers of its last `window` closes and volumes,
+    a sliding Welford mean/variance of bar returns, a running sum of volume changes and
+    smoothed RSI gains/losses. update() advances every ticker that has a new bar in one
+    vectorized step, so the cost per bar does not depend on the window length, and metrics()
+    returns the same dict as SectorRecommender.calculate_sector_metrics over the last `window` bars.
+
+    rsi='wilder' uses Wilder's smoothing; rsi='simple' uses the mean of the last RSI_WINDOW
+    changes, which matches the batch metrics whenever window > rsi_window.
+    """
+    def __init__(self, tickers, window=21, rsi_window=RSI_WINDOW, rsi='wilder', min_periods=5):
+        if rsi not in ('wilder', 'simple'):
+            raise ValueError(f"Unknown RSI smoothing {rsi!r}, expected 'wilder' or 'simple'")
+        if window < 5:
+            raise ValueError("window must hold at least 5 bars for the 5-day return")
+
+        self.tickers = list(tickers)
+        self.window = window
+        self.rsi_window = rsi_window
+        self.rsi = rsi
+        self.min_periods = min_periods
+        self.reset()
+
+    def reset(self):
+        """
+        Drop all state
+        """
+        n = len(self.tickers)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.closes = np.full((self.window, n), np.nan)
+        self.volumes = np.full((self.window, n), np.nan)
+
+        # Sliding Welford state of the bar returns inside the window
+        self.return_count = np.zeros(n, dtype=np.int64)
+        self.return_mean = np.zeros(n)
+        self.return_m2 = np.zeros(n)
+
+        # Volume changes inside the window; changes from a zero-volume bar are skipped
+        self.volume_change_sum = np.zeros(n)
+        self.volume_change_count = np.zeros(n, dtype=np.int64)
+
+        # RSI: smoothed average gain/loss, plus the last rsi_window changes for simple smoothing
+        self.avg_gain = np.zeros(n)
+        self.avg_loss = np.zeros(n)
+        self.deltas = np.zeros((self.rsi_window, n))
+
+    def update(self, closes, volumes):
+        """
+        Add one bar per ticker. closes and volumes are arrays in ticker order, or mappings /
+        Series keyed by ticker; tickers without a bar (missing or NaN close) are left unchanged.
+        """
+        closes, volumes = self._align(closes), self._align(volumes)
+        tickers = np.flatnonzero(~np.isnan(closes))
+        if len(tickers) == 0:
+            return
+
+        close, volume = closes[tickers], volumes[tickers]
+        count = self.count[tickers]
+        slot = count % self.window
+        previous_slot = (count - 1) % self.window
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            has_previous = count > 0
+            previous_close = np.where(has_previous, self.closes[previous_slot, tickers], np.nan)
+            previous_volume = np.where(has_previous, self.volumes[previous_slot, tickers], np.nan)
+
+            # The oldest bar leaves a full window, and with it the return and volume change into the next bar
+            full = count >= self.window
+            oldest_close = self.closes[slot, tickers]
+            second_close = self.closes[(slot + 1) % self.window, tickers]
+            self._remove_return(tickers[full], (second_close / oldest_close - 1)[full])
+            volume_out = (self.volumes[(slot + 1) % self.window, tickers] / self.volumes[slot, tickers] - 1)
+            self._add_volume_change(tickers[full], volume_out[full], sign=-1)
+
+            self._add_return(tickers[has_previous], (close / previous_close - 1)[has_previous])
+            self._add_volume_change(tickers[has_previous], (volume / previous_volume - 1)[has_previous], sign=1)
+            self._add_delta(tickers[has_previous], (close - previous_close)[has_previous], count[has_previous])
+
+        self.closes[slot, tickers] = close
+        self.volumes[slot, tickers] = volume
+        self.count[tickers] += 1
+
+    def extend(self, prices, volumes):
+        """
+        Feed a dates x tickers price and volume panel (e.g. from panelMetrics.build_panel) bar by bar
+        """
+        prices = prices.reindex(columns=self.tickers).to_numpy(dtype=np.float64)
+        volumes = volumes.reindex(columns=self.tickers).to_numpy(dtype=np.float64)
+        for close, volume in zip(prices, volumes):
+            self.update(close, volume)
+
+    def metrics(self):
+        """
+        Current metrics per ticker with at least min_periods bars, as a dict in the format of
+        SectorRecommender.calculate_sector_metrics (ready for get_top_sectors)
+        """
+        tickers = np.flatnonzero(self.count >= self.min_periods)
+        count = self.count[tickers]
+        bars = np.minimum(count, self.window)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            latest_close = self.closes[(count - 1) % self.window, tickers]
+            first_close = self.closes[(count - bars) % self.window, tickers]
+            five_days_ago_close = self.closes[(count - 5) % self.window, tickers]
+            cumulative_return = latest_close / first_close - 1
+            last_5d_return = latest_close / five_days_ago_close - 1
+
+            return_count = self.return_count[tickers]
+            variance = np.maximum(self.return_m2[tickers], 0) / (return_count - 1)
+            volatility = np.where(return_count > 1, np.sqrt(variance), np.nan) * np.sqrt(TRADING_DAYS)
+
+            volume_change_count = self.volume_change_count[tickers]
+            volume_trend = np.where(
+                volume_change_count > 0, self.volume_change_sum[tickers] / volume_change_count, np.nan
+            )
+
+            rs = self.avg_gain[tickers] / self.avg_loss[tickers]
+            # Simple smoothing counts the missing first change as zero, like a rolling mean over the
+            # bar series does; Wilder's needs rsi_window real changes
+            ready = count >= (self.rsi_window if self.rsi == 'simple' else self.rsi_window + 1)
+            rsi = np.where(ready, 100 - (100 / (1 + rs)), np.nan)
+
+            risk_adjusted_return = np.where(volatility != 0, cumulative_return / volatility, 0)
+
+        metrics = pd.DataFrame({
+            'return': cumulative_return,
+            'last_5d_return': last_5d_return,
+            'volatility': volatility,
+            'momentum_score': (2 * last_5d_return + cumulative_return) / 3,
+            'volume_trend': volume_trend,
+            'rsi': rsi,
+            'risk_adjusted_return': risk_adjusted_return
+        }, index=[self.tickers[i] for i in tickers])
+
+        return metrics.to_dict(orient='index')
+
+    def _align(self, values):
+        if isinstance(values, (dict, pd.Series)):
+            return pd.Series(values, dtype=np.float64).reindex(self.tickers).to_numpy()
+        return np.asarray(values, dtype=np.float64)
+
+    def _add_return(self, tickers, returns):
+        self.return_count[tickers] += 1
+        delta = returns - self.return_mean[tickers]
+        self.return_mean[tickers] += delta / self.return_count[tickers]
+        self.return_m2[tickers] += delta * (returns - self.return_mean[tickers])
+
+    def _remove_return(self, tickers, returns):
+        self.return_count[tickers] -= 1
+        remaining = self.return_count[tickers]
+        delta = returns - self.return_mean[tickers]
+        self.return_mean[tickers] = np.where(
+            remaining > 0, self.return_mean[tickers] - delta / np.maximum(remaining, 1), 0
+        )
+        self.return_m2[tickers] -= delta * (returns - self.return_mean[tickers])
+
+    def _add_volume_change(self, tickers, changes, sign):
+        finite = np.isfinite(changes)
+        self.volume_change_sum[tickers[finite]] += sign * changes[finite]
+        self.volume_change_count[tickers[finite]] += sign
+
+    def _add_delta(self, tickers, deltas, count):
+        gains, losses = np.maximum(deltas, 0), np.maximum(-deltas, 0)
+        if self.rsi == 'simple':
+            # Ratio of sums over the last rsi_window changes equals the ratio of their means
+            slot = (count - 1) % self.rsi_window
+            old = self.deltas[slot, tickers]
+            self.avg_gain[tickers] += gains - np.maximum(old, 0)
+            self.avg_loss[tickers] += losses - np.maximum(-old, 0)
+            self.deltas[slot, tickers] = deltas
+        else:
+            # Running mean over the first rsi_window changes, then Wilder's smoothing
+            smoothing = np.minimum(count, self.rsi_window)
+            self.avg_gain[tickers] += (gains - self.avg_gain[tickers]) / smoothing
+            self.avg_loss[tickers] += (losses - self.avg_loss[tickers]) / smoothing
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from financialRecommendation import FinancialRecommender
+
+
+def make_instruments(n_instruments=300, seed=0):
+    rng = np.random.default_rng(seed)
+    instruments = pd.DataFrame({
+        'instrument_id': [f'INST{i}' for i in range(n_instruments)],
+        'sector': [f'Sector{code}' for code in rng.integers(0, 6, n_instruments)],
+        'market_cap': rng.lognormal(7, 1.5, n_instruments),
+        'pe_ratio': rng.uniform(5, 80, n_instruments),
+        'dividend_yield': rng.uniform(0, 5, n_instruments),
+        'volatility': rng.uniform(0.1, 0.6, n_instruments),
+        'beta': rng.uniform(0.5, 2, n_instruments)
+    })
+    # Repeated feature rows give tied scores
+    features = instruments.columns.drop('instrument_id')
+    instruments.loc[n_instruments // 2:, features] = instruments.loc[:n_instruments - n_instruments // 2 - 1, features].to_numpy()
+    return instruments
+
+
+def make_recommender(instruments, similarity, holding_weight=None, n_users=60, seed=1):
+    recommender = FinancialRecommender(similarity=similarity, holding_weight=holding_weight)
+    recommender.add_instrument_features(instruments)
+    rng = np.random.default_rng(seed)
+    instrument_ids = list(instruments['instrument_id'])
+    for user in range(n_users):
+        recommender.add_user_holdings(f'USER{user}', {
+            instrument_ids[row]: {'quantity': int(rng.integers(1, 500)), 'purchase_price': float(rng.uniform(5, 500))}
+            for row in rng.choice(len(instrument_ids), 6, replace=False)
+        })
+    return recommender
+
+
+@pytest.mark.parametrize('similarity', ['dense', 'on_demand', 'top_k'])
+@pytest.mark.parametrize('holding_weight', [None, 'value'])
+@pytest.mark.parametrize('constant_column', [False, True])
+def test_batch_matches_single(similarity, holding_weight, constant_column):
+    instruments = make_instruments()
+    if constant_column:
+        # A constant feature normalizes to NaN, and so do the scores
+        instruments['dividend_yield'] = 0.0
+    recommender = make_recommender(instruments, similarity, holding_weight)
+
+    batch = list(recommender.get_recommendations_batch(n_recommendations=7, chunk_size=17))
+    assert [user_id for user_id, _ in batch] == list(recommender.user_holdings)
+    for user_id, recommendations in batch:
+        expected = recommender.get_recommendations(user_id, 7)
+        assert [instrument_id for instrument_id, _ in recommendations] == [instrument_id for instrument_id, _ in expected]
+        assert [score for _, score in recommendations] == pytest.approx([score for _, score in expected])
+
+
+def test_rejected_upsert_keeps_cached_results():
+    instruments = make_instruments()
+    recommender = make_recommender(instruments, 'dense')
+    model_version = recommender.model_version
+    with pytest.raises(ValueError):
+        recommender.upsert_instruments(instruments.iloc[[0, 0]])
+    assert recommender.model_version == model_version
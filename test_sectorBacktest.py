@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from sectorBacktest import SectorBacktest, weight_grid
+
+
+def make_backtest(top_n=3, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2020-01-01', periods=600)
+    columns = [f'S{i}' for i in range(6)]
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(dates), len(columns))), axis=0)),
+                          index=dates, columns=columns)
+    # Only two sectors are listed for the first half, fewer than top_n
+    prices.iloc[:300, 1:5] = np.nan
+    volumes = pd.DataFrame(rng.uniform(1e6, 2e6, prices.shape), index=dates, columns=columns)
+    return SectorBacktest(prices, volumes, top_n=top_n)
+
+
+def test_run_matches_sweep():
+    backtest = make_backtest()
+    grid = weight_grid(0.25)
+    sweep = backtest.sweep(grid).sort_index()
+    for i, weights in enumerate(grid):
+        replay = backtest.run(weights)
+        row = sweep.loc[i]
+        assert np.allclose(
+            [replay['portfolio_return'].mean(), replay['excess_return'].mean()],
+            [row['mean_return'], row['mean_excess']], equal_nan=True
+        ), weights
+
+
+def test_run_selects_top_scored_listed_sectors():
+    backtest = make_backtest()
+    weights = weight_grid(0.25)[0]
+    replay = backtest.run(weights)
+    forward_returns = backtest.forward_returns.loc[backtest.rebalance_dates]
+    expected = [
+        forward_returns.loc[date, scores.dropna().sort_values(ascending=False, kind='stable').head(3).index].mean()
+        if scores.notna().any() else np.nan
+        for date, scores in backtest.scores(weights).iterrows()
+    ]
+    assert np.allclose(replay['portfolio_return'], expected, equal_nan=True)
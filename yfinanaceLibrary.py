@@ -1,12 +1,22 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from marketDataSource import MarketDataFetcher
+from marketDataStore import MarketDataStore
+from panelMetrics import build_panel, composite_score, panel_metrics
+from streamingMetrics import StreamingMetrics
+
 class SectorRecommender:
-    def __init__(self):
+    def __init__(self, data_source=None, max_workers=4):
+        """
+        data_source: object with a download(tickers, period, interval) method returning a dict of
+        ticker -> OHLCV DataFrame; defaults to yfinance, use marketDataSource.FakeMarketDataSource offline
+        """
+        self.fetcher = MarketDataFetcher(data_source, max_workers=max_workers)
+        
         # Major sector ETFs for tracking sector performance
         self.sector_etfs = {
             'Technology': 'XLK',
@@ -43,80 +53,58 @@ class SectorRecommender:
         """
         sector_data = {}
         
+        # All ETFs in concurrent multi-ticker batches
+        etf_data, errors = self.fetcher.fetch(self.sector_etfs.values(), period=period, interval=interval)
+        
         for sector, etf in self.sector_etfs.items():
-            try:
-                etf_data = yf.download(etf, period=period, interval=interval, progress=False)
-                sector_data[sector] = etf_data
-            except Exception as e:
-                print(f"Error fetching data for {sector} ({etf}): {str(e)}")
+            if etf in errors:
+                print(f"Error fetching data for {sector} ({etf}): {str(errors[etf])}")
+            elif etf in etf_data:
+                sector_data[sector] = etf_data[etf]
                 
         return sector_data
     
     def calculate_sector_metrics(self, sector_data):
         """
         Calculate various performance metrics for each sector
+        sector_data: dict of sector -> OHLCV DataFrame, or a marketDataStore.MarketDataStore with one
+        instrument per sector
         """
-        metrics = {}
+        if isinstance(sector_data, MarketDataStore):
+            metrics = panel_metrics(sector_data.price_frame(), sector_data.volume_frame())
+        else:
+            # One wide dates x sectors panel, so every metric is a single vectorized pass over all sectors
+            frames = {sector: data for sector, data in sector_data.items() if not data.empty}
+            if not frames:
+                return {}
+            metrics = panel_metrics(build_panel(frames, 'Adj Close'), build_panel(frames, 'Volume'))
         
-        for sector, data in sector_data.items():
-            if not data.empty and len(data) >= 5:
-                # Calculate returns using proper indexing
-                latest_close = data['Adj Close'].iloc[-1]
-                five_days_ago_close = data['Adj Close'].iloc[-5]
-                first_close = data['Adj Close'].iloc[0]
-                
-                # Calculate returns
-                returns = data['Adj Close'].pct_change()
-                cumulative_return = (latest_close / first_close) - 1
-                last_5d_return = (latest_close / five_days_ago_close) - 1
-                
-                # Calculate volatility
-                volatility = data['Adj Close'].pct_change().std() * np.sqrt(252)  # Annualized volatility
-                
-                # Calculate momentum
-                momentum_score = (2 * last_5d_return + cumulative_return) / 3
-                
-                # Calculate volume trend
-                volume_trend = data['Volume'].pct_change().mean()
-                
-                # Calculate RSI
-                delta = data['Adj Close'].diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs.iloc[-1])) if not rs.empty else 50
-                
-                risk = 0
-                if not volatility.empty:
-                    risk = cumulative_return / volatility
+        return metrics.to_dict(orient='index')
 
-                metrics[sector] = {
-                    'return': cumulative_return,
-                    'last_5d_return': last_5d_return,
-                    'volatility': volatility,
-                    'momentum_score': momentum_score,
-                    'volume_trend': volume_trend,
-                    'rsi': rsi,
-                    'risk_adjusted_return': risk
-                }
-        
-        return metrics
-    
-    def get_top_sectors(self, metrics, top_n=3):
+    def create_sector_monitor(self, period='1d', interval='1m', rsi='wilder'):
+        """
+        Streaming sector metrics warmed up with the latest period of bars, window = bars fetched.
+        Feed new bars with monitor.update({sector: close}, {sector: volume}) and rank with
+        get_top_sectors(monitor.metrics()).
+        """
+        sector_data = {sector: data for sector, data in self.fetch_sector_data(period, interval).items() if not data.empty}
+        prices, volumes = build_panel(sector_data, 'Adj Close'), build_panel(sector_data, 'Volume')
+
+        monitor = StreamingMetrics(sector_data, window=max(len(prices), 5), rsi=rsi)
+        monitor.extend(prices, volumes)
+        return monitor
+
+    def get_top_sectors(self, metrics, top_n=3, weights=None):
         """
         Identify top performing sectors based on multiple metrics
+        weights: metric name -> weight of the composite score, defaults to panelMetrics.COMPOSITE_WEIGHTS
         """
         # Create DataFrame from metrics
         df_metrics = pd.DataFrame(metrics).T
         
         print(df_metrics.columns)
         # Calculate composite score
-        df_metrics['composite_score'] = (
-            df_metrics['momentum_score'] * 0.3 +
-            df_metrics['risk_adjusted_return'] * 0.3 +
-            (df_metrics['rsi'] / 100) * 0.2 +
-            df_metrics['volume_trend'] * 0.2
-        )
+        df_metrics['composite_score'] = composite_score(df_metrics, weights)
         
         # Sort sectors by composite score
         top_sectors = df_metrics.sort_values('composite_score', ascending=False).head(top_n)
@@ -127,37 +115,35 @@ class SectorRecommender:
         """
         Get stock recommendations for top performing sectors
         """
+        # Fetch recent data for the components of every top sector in one batched pass
+        all_stocks = [stock for sector in top_sectors.index for stock in self.sector_components[sector]]
+        price_data, errors = self.fetcher.fetch(all_stocks, period='1mo', interval='1d')
+        for stock, error in errors.items():
+            print(f"Error fetching data for {stock}: {str(error)}")
+        
+        # Metrics for all components at once, from a wide dates x stocks panel
+        frames = {stock: data for stock, data in price_data.items() if len(data) > 0}
+        stock_metrics = panel_metrics(build_panel(frames, 'Adj Close'), min_periods=1)
+        
+        return self.rank_sector_stocks(top_sectors, stock_metrics, num_stocks_per_sector)
+    
+    def rank_sector_stocks(self, top_sectors, stock_metrics, num_stocks_per_sector=3):
+        """
+        Pick the best components of each top sector by risk-adjusted return
+        stock_metrics: DataFrame of panel metrics indexed by stock
+        """
         recommendations = []
         
         for sector in top_sectors.index:
-            sector_stocks = self.sector_components[sector]
-            
-            # Fetch recent data for sector components
-            stock_data = {}
-            for stock in sector_stocks:
-                try:
-                    data = yf.download(stock, period='1mo', interval='1d', progress=False)
-                    if len(data) > 0:
-                        returns = data['Adj Close'].pct_change()
-                        momentum = (data['Adj Close'][-1] / data['Adj Close'][0]) - 1
-                        volatility = returns.std() * np.sqrt(252)
-                        stock_data[stock] = {
-                            'return': momentum,
-                            'volatility': volatility,
-                            'risk_adjusted_return': momentum / volatility if volatility != 0 else 0
-                        }
-                except Exception as e:
-                    print(f"Error fetching data for {stock}: {str(e)}")
+            sector_stocks = [stock for stock in self.sector_components[sector] if stock in stock_metrics.index]
             
             # Sort stocks by risk-adjusted return
-            sorted_stocks = sorted(
-                stock_data.items(),
-                key=lambda x: x[1]['risk_adjusted_return'],
-                reverse=True
+            sorted_stocks = stock_metrics.loc[sector_stocks].sort_values(
+                'risk_adjusted_return', ascending=False, kind='stable'
             )
             
             # Add top stocks from sector to recommendations
-            for stock, metrics in sorted_stocks[:num_stocks_per_sector]:
+            for stock, metrics in sorted_stocks.head(num_stocks_per_sector).iterrows():
                 recommendations.append({
                     'stock': stock,
                     'sector': sector,
@@ -169,9 +155,9 @@ class SectorRecommender:
         
         return recommendations
 
-def main():
+def main(data_source=None):
     # Initialize recommender
-    recommender = SectorRecommender()
+    recommender = SectorRecommender(data_source)
     
     print("Fetching sector data...")
     sector_data = recommender.fetch_sector_data()